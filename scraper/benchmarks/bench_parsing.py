@@ -0,0 +1,298 @@
+"""
+Offline parse-throughput benchmark.
+
+Runs each scraper's extraction path over the pages in benchmarks/fixtures and reports
+pages/sec, p50/p95 latency per extractor and peak memory, compared against benchmarks/baseline.json.
+benchmarks/fixtures/manifest.json says where each page came from: recorded from its live URL or synthetic.
+
+    python -m benchmarks.bench_parsing                     # run and compare against the baseline
+    python -m benchmarks.bench_parsing --save-baseline     # run and store the results as the new baseline
+    python -m benchmarks.bench_parsing --record-fixtures   # replace the fixtures with the live pages (needs network)
+"""
+import gc
+import os
+import sys
+import math
+import json
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+from scrapers.parsing import set_parser
+from scrapers.fingerprints import FingerprintIndex
+from scrapers.grant_ids import GrantIdRegistry
+from scrapers.frontier import SeenSet
+from scrapers.hcscraper import HealthCanadaGrantScraper
+from scrapers.kcscraper import KindredGrantScraper
+from scrapers.otfscraper import OTFGrantScraper
+from scrapers.transport import LiveTransport, RecordTransport
+
+logger = logging.getLogger(__name__)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+DEFAULT_BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+MANIFEST_PATH = os.path.join(FIXTURES_DIR, "manifest.json")
+
+HC_DETAIL_URL = "https://www.canada.ca/en/public-health/services/funding-opportunities/benchmark-detail.html"
+
+class NoFingerprints(FingerprintIndex):
+    """Fingerprint index that never matches, so every iteration parses the page in full"""
+
+    def lookup(self, page_key, page_fingerprint):
+        return None
+
+    def store(self, page_key, page_fingerprint, record, status=None):
+        pass
+
+    def save(self):
+        pass
+
+def read_fixture(name, binary=False):
+    if binary:
+        with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+            return f.read()
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def load_manifest():
+    # fixture file -> {'source': 'recorded' or 'synthetic', 'url', ...}
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        logger.warning(f"Error reading fixture manifest {MANIFEST_PATH}: {e}")
+        return {}
+
+def record_fixtures(transport=None):
+    """
+    Fetch the live pages the fixtures stand for and write them to benchmarks/fixtures, with their URLs and
+    the recording date in the manifest. The Health Canada detail fixture is the first open opportunity on
+    the recorded listing. Returns the manifest, or None if a page could not be fetched.
+    """
+    transport = transport or LiveTransport()
+    with tempfile.TemporaryDirectory() as work_dir:
+        id_registry = GrantIdRegistry(path=os.path.join(work_dir, "grant_ids.json"), seed_path=os.path.join(work_dir, "none.json"))
+        fingerprints = NoFingerprints(path=os.path.join(work_dir, "fingerprints.json"))
+        hc = HealthCanadaGrantScraper(id_registry=id_registry, fingerprints=fingerprints, transport=transport,
+                                      seen_urls=SeenSet(path=os.path.join(work_dir, "seen_urls.bin")))
+        kc = KindredGrantScraper(id_registry=id_registry, fingerprints=fingerprints, transport=transport)
+        otf = OTFGrantScraper(id_registry=id_registry, fingerprints=fingerprints, transport=transport)
+
+        pages = {}
+
+        def fetch(name, url):
+            try:
+                response = transport.get(url, headers=hc.headers, timeout=30)
+                response.raise_for_status()
+            except Exception as e:
+                logger.error(f"Error recording {name} from {url}: {e}")
+                return None
+            pages[name] = (url, response.content)
+            return response.content
+
+        listing = fetch("hc_listing.html", hc.base_url)
+        if listing is None:
+            return None
+        # only the recorded listing page, so the detail fixture matches it
+        hc.max_depth = 0
+        hc.fetch_page = lambda url: listing.decode('utf-8', errors='replace')
+        opportunities = hc.parse_funding_opportunities()
+        if not opportunities:
+            logger.error("No funding opportunities on the recorded Health Canada listing")
+            return None
+        targets = [("hc_detail.html", opportunities[0]['url']), ("kindred.html", kc.url),
+                   ("otf_seed.html", otf.grant_urls["Seed Grant"]), ("otf_grow.html", otf.grant_urls["Grow Grant"])]
+        for name, url in targets:
+            if fetch(name, url) is None:
+                return None
+
+    recorded_at = datetime.now().strftime('%Y-%m-%d')
+    manifest = {}
+    for name, (url, content) in pages.items():
+        with open(os.path.join(FIXTURES_DIR, name), 'wb') as f:
+            f.write(content)
+        manifest[name] = {'source': 'recorded', 'url': url, 'recorded_at': recorded_at, 'bytes': len(content)}
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=4)
+    print(f"Recorded {len(manifest)} fixtures to {FIXTURES_DIR}; save a new baseline with --save-baseline")
+    return manifest
+
+def build_extractors(work_dir):
+    """
+    Return (name, callable) pairs; each callable runs one scraper's extraction path over one recorded page
+    """
+    id_registry = GrantIdRegistry(path=os.path.join(work_dir, "grant_ids.json"), seed_path=os.path.join(work_dir, "none.json"))
+    fingerprints = NoFingerprints(path=os.path.join(work_dir, "fingerprints.json"))
+
+    manifest = load_manifest()
+    hc_listing = read_fixture("hc_listing.html")
+    hc_detail = read_fixture("hc_detail.html")
+    kindred = read_fixture("kindred.html")
+    otf_seed = read_fixture("otf_seed.html", binary=True)
+    otf_grow = read_fixture("otf_grow.html", binary=True)
+
+    seen_urls = SeenSet(path=os.path.join(work_dir, "seen_urls.bin"))
+
+    hc = HealthCanadaGrantScraper(id_registry=id_registry, fingerprints=fingerprints, seen_urls=seen_urls)
+    hc.fetch_page = lambda url: hc_listing
+    detail_url = manifest.get("hc_detail.html", {}).get('url') or HC_DETAIL_URL
+    opportunity = {'title': 'Benchmark funding opportunity', 'url': detail_url, 'status': 'Open'}
+
+    kc = KindredGrantScraper(id_registry=id_registry, fingerprints=fingerprints)
+    kc.fetch_page = lambda: kindred
+
+    otf = OTFGrantScraper(id_registry=id_registry, fingerprints=fingerprints)
+
+    return [
+        ('hc.parse_funding_opportunities', hc.parse_funding_opportunities),
+        ('hc.parse_grant_details', lambda: hc.parse_grant_details(opportunity, html=hc_detail)),
+        ('kc.scrape_grant', kc.scrape_grant),
+        ('otf.parse_grant[seed]', lambda: otf.parse_grant(otf_seed, "Seed Grant", otf.grant_urls["Seed Grant"])),
+        ('otf.parse_grant[grow]', lambda: otf.parse_grant(otf_grow, "Grow Grant", otf.grant_urls["Grow Grant"])),
+    ]
+
+def percentile(values, pct):
+    # nearest-rank percentile of a list of numbers
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+def run_benchmarks(iterations=200, warmup=10):
+    """
+    Time every extractor, then measure peak memory in a separate traced pass
+    so tracemalloc overhead does not skew the timings
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        extractors = build_extractors(work_dir)
+        results = {}
+
+        for name, extract in extractors:
+            for _ in range(warmup):
+                extract()
+
+            # like timeit, keep the garbage collector out of the measurements
+            gc.collect()
+            gc.disable()
+            timings = []
+            try:
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    extract()
+                    timings.append(time.perf_counter() - start)
+            finally:
+                gc.enable()
+
+            total = sum(timings)
+            results[name] = {
+                'pages_per_sec': round(iterations / total, 2) if total else None,
+                'p50_ms': round(percentile(timings, 50) * 1000, 3),
+                'p95_ms': round(percentile(timings, 95) * 1000, 3),
+                'min_ms': round(min(timings) * 1000, 3),
+            }
+
+        tracemalloc.start()
+        for name, extract in extractors:
+            tracemalloc.reset_peak()
+            extract()
+            results[name]['peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+
+    total_time = sum(iterations / result['pages_per_sec'] for result in results.values() if result['pages_per_sec'])
+    return {
+        'run_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': sys.version.split()[0],
+        'iterations': iterations,
+        'fixtures': {name: entry.get('source') for name, entry in sorted(load_manifest().items())},
+        'pages_per_sec': round(iterations * len(results) / total_time, 2) if total_time else None,
+        'extractors': results
+    }
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning(f"Error reading benchmark baseline {path}: {e}")
+        return None
+
+def compare(report, baseline, tolerance):
+    """
+    Return the extractors whose median latency rose more than `tolerance` (a fraction) above the baseline.
+    The median is compared rather than pages/sec because it is far less sensitive to a few slow runs.
+    Nothing is compared when the baseline was measured on different fixtures (recorded vs synthetic).
+    """
+    regressions = []
+    if baseline.get('fixtures') != report['fixtures']:
+        logger.warning("The baseline was measured on different fixtures; save a new one with --save-baseline")
+        return regressions
+    for name, result in report['extractors'].items():
+        previous = (baseline.get('extractors') or {}).get(name)
+        if not previous or not previous.get('p50_ms'):
+            continue
+        change = result['p50_ms'] / previous['p50_ms'] - 1
+        result['vs_baseline'] = f"{change:+.1%}"
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+def print_report(report):
+    print(f"{'extractor':<34}{'pages/sec':>12}{'p50 ms':>10}{'p95 ms':>10}{'peak KB':>10}{'p50 vs base':>13}")
+    for name, result in report['extractors'].items():
+        print(
+            f"{name:<34}{result['pages_per_sec']:>12}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+            f"{result['peak_kb']:>10}{result.get('vs_baseline', '-'):>13}"
+        )
+    print(f"overall: {report['pages_per_sec']} pages/sec over {report['iterations']} iterations per extractor")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline parse-throughput benchmark for the grant scrapers")
+    parser.add_argument('--iterations', type=int, default=200, help="timed runs per extractor")
+    parser.add_argument('--warmup', type=int, default=10, help="untimed runs per extractor before timing")
+    parser.add_argument('--parser', default=None, help="HTML parser backend to benchmark (lxml, html.parser, html5lib)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_PATH, help="baseline file to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed p50 latency increase before failing (fraction)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--record-fixtures', action='store_true', help="replace the fixtures with the live pages, then exit")
+    parser.add_argument('--cassette-dir', help="with --record-fixtures, also save the responses as replay cassettes here")
+    args = parser.parse_args()
+
+    if args.record_fixtures:
+        transport = RecordTransport(args.cassette_dir) if args.cassette_dir else LiveTransport()
+        return 0 if record_fixtures(transport) else 1
+
+    # per-page log lines would dominate the timings
+    logging.disable(logging.INFO)
+
+    if args.parser:
+        set_parser(args.parser)
+
+    report = run_benchmarks(iterations=args.iterations, warmup=args.warmup)
+
+    regressions = []
+    baseline = None if args.save_baseline else load_baseline(args.baseline)
+    if baseline:
+        regressions = compare(report, baseline, args.tolerance)
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print_report(report)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+        print(f"Saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"Median latency regressed more than {args.tolerance:.0%} for: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,19 @@
 import os
-import json
 import logging
 import sys
+import argparse
 from datetime import datetime
-import time
-from supabase import create_client
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
-# Import all scrapers
-from scrapers.hcscraper import HealthCanadaGrantScraper
-from scrapers.kcscraper import KindredGrantScraper
-from scrapers.otfscraper import OTFGrantScraper
+from scrapers.sources import SOURCES, select_sources, create_scraper
+from scrapers.storage import SupabaseStore, SQLiteStore, FlatFileStore
+from scrapers.transport import get_transport, TRANSPORTS
+from scrapers.metrics import metrics
+from scrapers.pipeline import ParsePool
+from scrapers.ndjson import NdjsonWriter, read_ndjson
+from scrapers.changes import detect_changes, write_change_feed
+from scrapers.fingerprints import fingerprint_index
 
 # Configure logging
 logging.basicConfig(
@@ -27,86 +30,64 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
-# Supabase configuration
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+_supabase = None
+_supabase_checked = False
 
-# Initialize Supabase client if credentials are available
-supabase = None
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-        logger.info("Supabase client initialized successfully")
-    except Exception as e:
-        logger.error(f"Error initializing Supabase client: {e}")
-else:
-    logger.warning("Supabase credentials not found. Will save data locally only.")
-    # Debug information
-    logger.info(f"SUPABASE_URL available: {SUPABASE_URL is not None}")
-    logger.info(f"SUPABASE_KEY available: {SUPABASE_KEY is not None}")
+def get_supabase_client():
+    """
+    Create the Supabase client on first use, or return None if credentials are missing.
+    The supabase package is only imported when a run actually saves to the database.
+    """
+    global _supabase, _supabase_checked
+    if _supabase_checked:
+        return _supabase
+    _supabase_checked = True
+    
+    # Supabase configuration
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
+    
+    if supabase_url and supabase_key:
+        try:
+            from supabase import create_client
+            _supabase = create_client(supabase_url, supabase_key)
+            logger.info("Supabase client initialized successfully")
+        except Exception as e:
+            logger.error(f"Error initializing Supabase client: {e}")
+    else:
+        logger.warning("Supabase credentials not found. Will save data locally only.")
+        # Debug information
+        logger.info(f"SUPABASE_URL available: {supabase_url is not None}")
+        logger.info(f"SUPABASE_KEY available: {supabase_key is not None}")
+    return _supabase
 
-def save_to_supabase(grants):
+def get_storage_backends():
     """
-    Save grants to Supabase database using upsert to avoid duplicates
+    Return the stores each run is saved to: a local SQLite copy, plus Supabase when configured
     """
-    if not supabase:
+    stores = [SQLiteStore()]
+    supabase = get_supabase_client()
+    if supabase:
+        stores.append(SupabaseStore(supabase))
+    return stores
+
+def save_to_stores(grants):
+    """
+    Sync grants to every storage backend, only sending new or changed grants
+    """
+    stores = get_storage_backends()
+    if not any(store.name == 'supabase' for store in stores):
         logger.warning("Supabase client not available. Skipping database upload.")
-        return
     
-    try:
-        # Ensure grants is a list
-        if not isinstance(grants, list):
-            grants = [grants]
-        
-        if not grants:
-            logger.warning("No grants to save to Supabase")
-            return
-        
-        # Prepare data for upsert
-        # This ensures that if a grant with the same ID already exists, it will be updated
-        logger.info(f"Upserting {len(grants)} grants to Supabase")
-        
-        # Convert datetime objects to ISO format for Supabase
-        formatted_grants = []
-        for grant in grants:
-            formatted_grant = grant.copy()
-            
-            # Format dates for Supabase if needed
-            for key in ['crawled_date', 'last_updated']:
-                if key in formatted_grant and not isinstance(formatted_grant[key], str):
-                    formatted_grant[key] = formatted_grant[key].isoformat() if formatted_grant[key] else None
-            
-            # Make sure deadline is in proper date format (YYYY-MM-DD)
-            if 'deadline' in formatted_grant and formatted_grant['deadline']:
-                # If it's already a string in the right format, keep it
-                if not isinstance(formatted_grant['deadline'], str):
-                    formatted_grant['deadline'] = formatted_grant['deadline'].strftime('%Y-%m-%d')
-                elif len(formatted_grant['deadline']) > 10:
-                    # Truncate if it has time component
-                    formatted_grant['deadline'] = formatted_grant['deadline'][:10]
-            
-            # Make sure numeric fields are properly typed
-            if 'amount' in formatted_grant and formatted_grant['amount'] is not None:
-                try:
-                    formatted_grant['amount'] = float(formatted_grant['amount'])
-                except (ValueError, TypeError):
-                    formatted_grant['amount'] = None
-            
-            # Ensure boolean fields are properly typed
-            if 'is_active' in formatted_grant:
-                formatted_grant['is_active'] = bool(formatted_grant['is_active'])
-                
-            formatted_grants.append(formatted_grant)
-        
-        # Upsert data to Grant table
-        # This will insert new records and update existing ones based on the grant_id
-        result = supabase.table('Grant').upsert(formatted_grants, on_conflict='grant_id').execute()
-        
-        logger.info(f"Successfully saved {len(formatted_grants)} grants to Supabase")
-        return result
-    except Exception as e:
-        logger.error(f"Error saving to Supabase: {e}")
-        return None
+    for store in stores:
+        try:
+            with metrics.timer('all', f"save.{store.name}"):
+                counts = store.sync(grants)
+            for key, value in counts.items():
+                metrics.count('all', f"{store.name}.{key}", value)
+            logger.info(f"{store.name} store: {counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged")
+        except Exception as e:
+            logger.error(f"Error saving grants to {store.name} store: {e}")
 
 def ensure_directories():
     """
@@ -124,73 +105,292 @@ def ensure_directories():
         os.makedirs(directory, exist_ok=True)
         logger.info(f"Ensured directory exists: {directory}")
 
-def run_all_scrapers():
+def run_source(key, transport=None, parse_pool=None, listings=None):
+    """
+    Run a single scraper and return its grants.
+    The grant ids the source still lists are recorded in `listings` by source_id (None if its listing was incomplete).
+    """
+    name = SOURCES[key][0]
+    logger.info(f"Starting {name} Grant scraper")
+    scraper = create_scraper(key, transport=transport, parse_pool=parse_pool)
+    with metrics.timer(key, 'total'):
+        grants = scraper.run()
+    if listings is not None:
+        listings[scraper.source_id] = scraper.listed_grant_ids()
+    metrics.count(key, 'grants', len(grants or []))
+    if grants:
+        logger.info(f"Found {len(grants)} {name} grants")
+    else:
+        logger.warning(f"No {name} grants found")
+    return grants or []
+
+def run_sources_sequentially(all_grants, keys, transport=None, parse_pool=None, writer=None, listings=None):
+    """
+    Run each source one after another, isolating failures per source.
+    Each source's grants are streamed to `writer` (an NdjsonWriter) as soon as it finishes.
+    """
+    for key in keys:
+        try:
+            grants = run_source(key, transport, parse_pool, listings)
+            all_grants.extend(grants)
+            if writer:
+                writer.write_many(grants)
+        except Exception as e:
+            logger.error(f"Error running {SOURCES[key][0]} scraper: {e}", exc_info=True)
+
+def run_sources_in_parallel(all_grants, keys, transport=None, parse_pool=None, writer=None, listings=None):
+    """
+    Run each source in its own thread and merge results (and stream them to `writer`) as each one finishes.
+    Sources hit unrelated hosts, so politeness delays are applied per host by the shared throttle.
+    """
+    with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+        futures = {executor.submit(run_source, key, transport, parse_pool, listings): key for key in keys}
+        for future in as_completed(futures):
+            name = SOURCES[futures[future]][0]
+            try:
+                grants = future.result()
+                all_grants.extend(grants)
+                if writer:
+                    writer.write_many(grants)
+                logger.info(f"Finished {name} scraper ({len(all_grants)} grants collected so far)")
+            except Exception as e:
+                logger.error(f"Error running {name} scraper: {e}", exc_info=True)
+
+def save_local_files(all_grants, ndjson_path=None):
+    """
+    Save per-source and combined grant files under data/.
+    The files are derived from the run's NDJSON file when one was written, otherwise from `all_grants`.
+    The combined files are merged with grants from earlier runs, so a run limited with --only keeps every other source.
+    """
+    from scrapers.utils import save_grants
+    with metrics.timer('all', 'save.local'):
+        save_grants(read_ndjson(ndjson_path) if ndjson_path else all_grants)
+
+def find_changes(all_grants, listings=None):
+    """
+    Compare the run with the previous state of the same sources; `listings` holds what each source still lists.
+    Returns the change feed, the grants that dropped off their source marked inactive, and the grants
+    that are still listed but were not scraped this run; (None, [], []) if the comparison fails.
+    """
+    try:
+        with metrics.timer('all', 'changes'):
+            return detect_changes(all_grants, listings=listings)
+    except Exception as e:
+        logger.error(f"Error comparing grants with the previous run: {e}")
+        return None, [], []
+
+def forget_removed(deactivated):
+    """
+    Drop the page fingerprints of grants that left their listing. The status sweep recomputes is_active from
+    the inputs stored with them and would otherwise reactivate a removed grant whose deadline has not passed.
+    """
+    if not deactivated:
+        return
+    dropped = fingerprint_index.forget(grant['grant_id'] for grant in deactivated)
+    fingerprint_index.save()
+    logger.info(f"Dropped {dropped} page fingerprints of grants no longer listed")
+
+def known_grants(all_grants, skip_db=False):
+    """
+    Every known grant: the SQLite store (the merged combined JSON with skip_db), with the run's grants taking
+    precedence, so steps that replace their output whole still cover the sources a run with --only left out
+    """
+    stored = FlatFileStore().load() if skip_db else SQLiteStore().load()
+    grants_by_id = {grant['grant_id']: grant for grant in stored}
+    grants_by_id.update((grant['grant_id'], grant) for grant in all_grants)
+    return list(grants_by_id.values())
+
+def link_duplicates(all_grants, skip_db=False):
     """
-    Run all scrapers and save results to Supabase and local files
+    Find near-duplicate grants across sources, over every known grant, and link each to its canonical grant.
+    Returns grant_id -> {'canonical_grant_id', 'similarity'}; empty if the check fails.
+    """
+    try:
+        from scrapers.dedup import find_duplicates
+        with metrics.timer('all', 'dedup'):
+            return find_duplicates(known_grants(all_grants, skip_db))
+    except Exception as e:
+        logger.error(f"Error looking for duplicate grants: {e}")
+        return {}
+
+def save_duplicates(links, skip_db=False):
+    """
+    Write the duplicate links to data/duplicates.json and, unless skip_db, to the SQLite store
+    """
+    try:
+        from scrapers.dedup import write_duplicates
+        write_duplicates(links)
+        if not skip_db:
+            SQLiteStore().save_duplicates(links)
+    except Exception as e:
+        logger.error(f"Error saving duplicate links: {e}")
+
+def save_history(all_grants):
+    """
+    Append the run's grants to the Parquet history in data/history/
+    """
+    try:
+        from scrapers.history import history_store
+        with metrics.timer('all', 'save.history'):
+            history_store.append(all_grants)
+    except Exception as e:
+        logger.error(f"Error appending grants to the history store: {e}")
+
+def save_summary(all_grants, skip_db=False, supabase=True):
+    """
+    Compute the dashboard aggregates and save them to data/grant_summary.json, the SQLite grant_summary table
+    and, when configured and `supabase` is set, the Supabase GrantSummary table the dashboard reads.
+    They cover every grant in the SQLite store, or only the run's grants with skip_db (which also skips both tables).
+    """
+    try:
+        from scrapers.summary import summarize, summary_rows, write_summary
+        with metrics.timer('all', 'summary'):
+            sqlite = None if skip_db else SQLiteStore()
+            summary = summarize(sqlite.load() if sqlite else all_grants)
+            write_summary(summary)
+            if sqlite:
+                rows = summary_rows(summary)
+                sqlite.save_summary(rows, summary['as_of'])
+                client = get_supabase_client() if supabase else None
+                if client:
+                    SupabaseStore(client).save_summary(rows, summary['as_of'])
+    except Exception as e:
+        logger.error(f"Error saving the grant summary: {e}")
+
+def build_search_index(all_grants, skip_db=False):
+    """
+    Rebuild the full-text search index in data/search.db over every known grant (see known_grants)
+    """
+    try:
+        from scrapers.search import search_index
+        with metrics.timer('all', 'search.index'):
+            search_index.build(known_grants(all_grants, skip_db))
+    except Exception as e:
+        logger.error(f"Error building the search index: {e}")
+
+def run_all_scrapers(parallel=True, transport=None, only=None, skip_db=False, dry_run=False, parse_workers=0, compress=False):
+    """
+    Run the selected scrapers (all by default) and save results to Supabase and local files.
+    Pages are fetched through `transport` (live, record or replay), SCRAPER_TRANSPORT by default.
+    skip_db leaves out the SQLite and Supabase stores; dry_run scrapes without saving anything.
+    parse_workers > 0 parses pages in that many processes while the scrapers keep fetching.
+    Grants are streamed to data/all_grants.ndjson as each source finishes (gzipped with compress=True).
     """
     all_grants = []
+    listings = {}  # source_id -> grant ids each source still lists, filled in by run_source
+    metrics.reset()
+    keys = select_sources(only)
+    transport = transport or get_transport()
+    logger.info(f"Running {', '.join(keys)} with the {transport.mode} transport")
     
     # Ensure all directories exist
     ensure_directories()
     
+    ndjson_path = os.path.join("data", "all_grants.ndjson.gz" if compress else "all_grants.ndjson")
+    writer = None if dry_run else NdjsonWriter(ndjson_path)
+    
     try:
-        # Health Canada Grants
-        logger.info("Starting Health Canada Grant scraper")
-        hc_scraper = HealthCanadaGrantScraper()
-        hc_grants = hc_scraper.run()
-        if hc_grants:
-            logger.info(f"Found {len(hc_grants)} Health Canada grants")
-            all_grants.extend(hc_grants)
-        else:
-            logger.warning("No Health Canada grants found")
-        
-        # Allow some time between scrapers to avoid rate limiting
-        time.sleep(5)
-        
-        # Kindred Cares Grants
-        logger.info("Starting Kindred Cares Grant scraper")
-        kc_scraper = KindredGrantScraper()
-        kc_grants = kc_scraper.run()
-        if kc_grants:
-            logger.info(f"Found {len(kc_grants)} Kindred Cares grants")
-            all_grants.extend(kc_grants)
-        else:
-            logger.warning("No Kindred Cares grants found")
+        parse_pool = ParsePool(parse_workers) if parse_workers > 0 else None
+        try:
+            if parallel and len(keys) > 1:
+                run_sources_in_parallel(all_grants, keys, transport, parse_pool, writer, listings)
+            else:
+                run_sources_sequentially(all_grants, keys, transport, parse_pool, writer, listings)
+        finally:
+            if parse_pool:
+                parse_pool.close()
         
-        time.sleep(5)
-        
-        # OTF Grants
-        logger.info("Starting OTF Grant scraper")
-        otf_scraper = OTFGrantScraper()
-        otf_grants = otf_scraper.run()
-        if otf_grants:
-            logger.info(f"Found {len(otf_grants)} OTF grants")
-            all_grants.extend(otf_grants)
+        if not all_grants:
+            logger.warning("No grants found from any source")
+            if writer:
+                writer.abort()
+        elif dry_run:
+            logger.info(f"Dry run: scraped {len(all_grants)} grants, nothing saved")
+            for grant in all_grants:
+                logger.info(f"Would save grant {grant['grant_id']}: {grant['title']}")
+            _, deactivated, _ = find_changes(all_grants, listings)
+            for grant in deactivated:
+                logger.info(f"Would mark grant {grant['grant_id']} inactive: {grant['title']}")
+            # the combined JSON stands in for SQLite, so a dry run doesn't create data/grants.db
+            for grant_id, link in link_duplicates(all_grants, skip_db=True).items():
+                logger.info(f"Would link grant {grant_id} to canonical grant {link['canonical_grant_id']} ({link['similarity']})")
         else:
-            logger.warning("No OTF grants found")
-        
-        # Save all grants to Supabase
-        if all_grants:
-            save_to_supabase(all_grants)
-            logger.info(f"Completed scraping with {len(all_grants)} total grants")
+            # compare against the history before this run is appended to it
+            feed, deactivated, kept = find_changes(all_grants, listings)
+            # grants no longer listed are saved as inactive everywhere, so the change is recorded even with --skip-db
+            writer.write_many(deactivated)
+            writer.close()
+            save_local_files(all_grants + deactivated, ndjson_path)
+            # grants still listed but not scraped this run stay in the history unchanged
+            save_history(all_grants + deactivated + kept)
+            forget_removed(deactivated)
             
-            # Save combined grants to data directory for reference
-            try:
-                combined_file = os.path.join("data", "all_grants.json")
-                with open(combined_file, 'w', encoding='utf-8') as f:
-                    json.dump(all_grants, f, ensure_ascii=False, indent=4)
-                logger.info(f"Saved combined grants to {combined_file}")
-            except Exception as e:
-                logger.error(f"Error saving combined grants file: {e}")
-        else:
-            logger.warning("No grants found from any source")
+            # Save all grants to Supabase and the local SQLite store; grants no longer listed are marked inactive
+            if skip_db:
+                logger.info("Skipping database stores (--skip-db)")
+            else:
+                save_to_stores(all_grants + deactivated)
+            if feed:
+                write_change_feed(feed)
+            save_duplicates(link_duplicates(all_grants, skip_db), skip_db)
+            build_search_index(all_grants, skip_db)
+            save_summary(all_grants, skip_db)
+            logger.info(f"Completed scraping with {len(all_grants)} total grants")
     
     except Exception as e:
         logger.error(f"Error running scrapers: {e}", exc_info=True)
+        if writer:
+            writer.abort()
+    
+    # structured timings and counters for this run: logs/run_report.json and logs/scraper_metrics.prom
+    report = metrics.write()
+    logger.info(f"Run took {report['duration_s']}s; see logs/run_report.json for per-stage timings")
     
     return all_grants
 
-if __name__ == "__main__":
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape grant sources and save the results")
+    parser.add_argument('--only', help=f"comma-separated sources to run ({', '.join(SOURCES)}); all by default")
+    parser.add_argument('--skip-db', action='store_true', help="save local files only, not SQLite or Supabase; with --sweep-status, update SQLite but not Supabase")
+    parser.add_argument('--dry-run', action='store_true', help="scrape and parse without saving anything")
+    parser.add_argument('--sequential', action='store_true', help="run sources one after another")
+    parser.add_argument('--transport', choices=list(TRANSPORTS), help="live, record or replay (SCRAPER_TRANSPORT by default)")
+    parser.add_argument('--cassette-dir', help="cassette directory for record and replay")
+    parser.add_argument('--parse-workers', type=int, default=0, help="parse pages in N processes (0 parses inline)")
+    parser.add_argument('--gzip', action='store_true', help="write the run's grants to data/all_grants.ndjson.gz instead of .ndjson")
+    parser.add_argument('--sweep-status', action='store_true', help="recompute is_active from stored status inputs and push flipped grants, without scraping")
+    args = parser.parse_args(argv)
+    try:
+        args.only = select_sources(args.only)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.sweep_status:
+        from scrapers.status import sweep_status
+        stores = [SQLiteStore()] if args.skip_db else get_storage_backends()
+        changed = sweep_status(sqlite=stores[0], stores=stores, dry_run=args.dry_run)
+        if not args.dry_run:
+            # deadline buckets move with the date even when no grant flipped; the summary is read from SQLite
+            save_summary(changed, supabase=not args.skip_db)
+            if changed:
+                # the index stores is_active for its active-only filter
+                build_search_index(changed)
+        return
+    
     logger.info("Starting grant scraper process")
-    grants = run_all_scrapers()
-    logger.info("Grant scraper process completed") 
\ No newline at end of file
+    run_all_scrapers(
+        parallel=not args.sequential,
+        transport=get_transport(args.transport, args.cassette_dir),
+        only=args.only,
+        skip_db=args.skip_db,
+        dry_run=args.dry_run,
+        parse_workers=args.parse_workers,
+        compress=args.gzip
+    )
+    logger.info("Grant scraper process completed")
+
+if __name__ == "__main__":
+    main()
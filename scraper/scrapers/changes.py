@@ -0,0 +1,90 @@
+import os
+import json
+import logging
+from datetime import datetime
+from scrapers.storage import GRANT_COLUMNS, VOLATILE_FIELDS, format_grant
+from scrapers.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEED_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "change_feed.json")
+
+def _comparable(grant):
+    # the stored fields of a grant that count as a change, with normalized types
+    formatted_grant = format_grant(grant)
+    return {key: formatted_grant.get(key) for key in GRANT_COLUMNS if key not in VOLATILE_FIELDS}
+
+def diff_grants(previous, current):
+    """
+    Compare two lists of grants by grant_id and return the change feed:
+    added and removed grant_ids, and for modified grants each changed field as [old, new]
+    """
+    previous_by_id = {grant['grant_id']: grant for grant in previous}
+    current_by_id = {grant['grant_id']: grant for grant in current}
+
+    added = [grant_id for grant_id in current_by_id if grant_id not in previous_by_id]
+    removed = [grant_id for grant_id in previous_by_id if grant_id not in current_by_id]
+    modified = {}
+    for grant_id, grant in current_by_id.items():
+        if grant_id not in previous_by_id:
+            continue
+        old, new = _comparable(previous_by_id[grant_id]), _comparable(grant)
+        fields = {key: [old[key], new[key]] for key in new if old[key] != new[key]}
+        if fields:
+            modified[grant_id] = fields
+    return {'added': added, 'modified': modified, 'removed': removed}
+
+def deactivate(grants, when=None):
+    # copies of grants that dropped off their source, marked inactive
+    timestamp = (when or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+    return [{**grant, 'is_active': False, 'last_updated': timestamp} for grant in grants]
+
+def detect_changes(grants, history=None, listings=None):
+    """
+    Compare a run's grants with the latest stored state of the same sources (from the Parquet history).
+    `listings` maps source_id -> grant ids still listed by that source this run, or None when its listing
+    was not crawled completely. A grant only counts as removed when its source's listing was crawled
+    completely and no longer includes it. Only the run that deactivates a grant reports it: a grant already
+    stored as inactive that is gone this run is left out of the comparison. Grants that are still listed but
+    were not scraped this run, for example because their page failed to fetch or parse, are reported as
+    missing and left unchanged.
+    Returns (feed, deactivated, kept): deactivated holds the removed grants marked inactive, ready to save,
+    and kept the missing grants as previously stored, so the run's history snapshot still includes them.
+    """
+    if history is None:
+        from scrapers.history import history_store as history
+    from scrapers.history import frame_to_grants
+    listings = listings or {}
+
+    sources = sorted({grant['source_id'] for grant in grants} | set(listings))
+    previous = frame_to_grants(history.as_of(datetime.now(), sources=sources))
+    feed = diff_grants(previous, grants)
+
+    previous_by_id = {grant['grant_id']: grant for grant in previous}
+    removed, missing = [], []
+    for grant_id in feed['removed']:
+        if not previous_by_id[grant_id]['is_active']:
+            continue
+        listed = listings.get(previous_by_id[grant_id]['source_id'])
+        (removed if listed is not None and grant_id not in listed else missing).append(grant_id)
+    deactivated = deactivate([previous_by_id[grant_id] for grant_id in removed])
+    kept = [previous_by_id[grant_id] for grant_id in missing]
+
+    feed = {'run_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'sources': sources, **feed, 'removed': removed, 'missing': missing}
+    for kind in ('added', 'modified', 'removed', 'missing'):
+        metrics.count('all', f"changes.{kind}", len(feed[kind]))
+    logger.info(f"Changes since the last run: {len(feed['added'])} added, {len(feed['modified'])} modified, "
+                f"{len(feed['removed'])} removed, {len(missing)} missing but not confirmed removed")
+    return feed, deactivated, kept
+
+def write_change_feed(feed, path=None):
+    """
+    Write the run's change feed to data/change_feed.json for downstream syncs and dashboards
+    """
+    path = path or DEFAULT_FEED_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(feed, f, ensure_ascii=False, indent=4, default=str)
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote change feed to {path}")
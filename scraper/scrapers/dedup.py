@@ -0,0 +1,142 @@
+import os
+import re
+import json
+import zlib
+import logging
+from datetime import datetime
+import numpy as np
+from scrapers.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DUPLICATES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "duplicates.json")
+
+# text compared between grants
+SHINGLE_FIELDS = ('title', 'description', 'eligibility_criteria')
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+WORD_PATTERN = re.compile(r'\w+')
+
+def shingles(grant, size=3):
+    """
+    Set of hashed word n-grams over a grant's title, description and eligibility criteria, as 32-bit ints.
+    Text is lowercased and split on non-word characters, so punctuation and spacing don't count.
+    """
+    words = WORD_PATTERN.findall(' '.join(str(grant.get(field) or '') for field in SHINGLE_FIELDS).lower())
+    grams = {' '.join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))} if words else set()
+    return {zlib.crc32(gram.encode('utf-8')) for gram in grams}
+
+class MinHashLSH:
+    """
+    MinHash signatures of grant shingles with LSH banding.
+    Each signature of num_perm minimum hashes is cut into `bands` bands; grants sharing any band land in
+    the same bucket and become candidates, so only those pairs are compared instead of every pair.
+    With the defaults (16 bands of 8 rows) pairs above about 0.7 Jaccard similarity are almost always found.
+    """
+
+    def __init__(self, num_perm=128, bands=16, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # one (a * x + b) mod p permutation per hash
+        generator = np.random.RandomState(seed)
+        self.a = generator.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self.b = generator.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes):
+        # minimum of each permutation over the shingle hashes; None for a grant without text
+        if not hashes:
+            return None
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        permuted = ((values[:, None] * self.a + self.b) % MERSENNE_PRIME) & MAX_HASH
+        return permuted.min(axis=0)
+
+    def candidates(self, signatures):
+        """
+        Pairs of positions (i, j), i < j, whose signatures share at least one band
+        """
+        pairs = set()
+        for band in range(self.bands):
+            buckets = {}
+            start = band * self.rows
+            for position, signature in enumerate(signatures):
+                if signature is not None:
+                    buckets.setdefault(signature[start:start + self.rows].tobytes(), []).append(position)
+            for members in buckets.values():
+                for i, first in enumerate(members):
+                    pairs.update((first, second) for second in members[i + 1:])
+        return pairs
+
+def similarity(first, second):
+    # estimated Jaccard similarity of two signatures
+    return float(np.mean(first == second))
+
+def _root(parents, position):
+    while parents[position] != position:
+        parents[position] = parents[parents[position]]
+        position = parents[position]
+    return position
+
+def find_duplicates(grants, threshold=0.8, lsh=None):
+    """
+    Group grants whose title, description and eligibility criteria are near-identical, across sources.
+    Candidate pairs come from LSH buckets, only between grants from different sources, and are kept when
+    their estimated similarity reaches `threshold`. Grants of one source are only grouped through a grant
+    of another source that matches both.
+    Each group is linked under a canonical grant, the one from the lowest source_id and then grant_id.
+    Returns grant_id -> {'canonical_grant_id', 'similarity'} for every grant that is not canonical.
+    """
+    lsh = lsh or MinHashLSH()
+    signatures = [lsh.signature(shingles(grant)) for grant in grants]
+    # grant IDs already tell a source's own grants apart; similar wording there is a template, not a duplicate
+    pairs = {(first, second) for first, second in lsh.candidates(signatures)
+             if int(grants[first]['source_id']) != int(grants[second]['source_id'])}
+
+    parents = list(range(len(grants)))
+    matched = 0
+    for first, second in pairs:
+        if similarity(signatures[first], signatures[second]) >= threshold:
+            parents[_root(parents, first)] = _root(parents, second)
+            matched += 1
+
+    groups = {}
+    for position in range(len(grants)):
+        groups.setdefault(_root(parents, position), []).append(position)
+
+    links = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        canonical = min(members, key=lambda position: (int(grants[position]['source_id']), int(grants[position]['grant_id'])))
+        for position in members:
+            if position != canonical:
+                links[grants[position]['grant_id']] = {
+                    'canonical_grant_id': grants[canonical]['grant_id'],
+                    'similarity': round(similarity(signatures[position], signatures[canonical]), 3)
+                }
+
+    metrics.count('all', 'dedup.candidates', len(pairs))
+    metrics.count('all', 'dedup.linked', len(links))
+    logger.info(f"Near-duplicate check: {len(pairs)} candidate pairs, {matched} matched, "
+                f"{len(links)} of {len(grants)} grants linked to a canonical grant")
+    return links
+
+def write_duplicates(links, path=None):
+    """
+    Write the duplicate links to data/duplicates.json, grouped by canonical grant, replacing the previous file
+    """
+    path = path or DEFAULT_DUPLICATES_PATH
+    groups = {}
+    for grant_id, link in links.items():
+        groups.setdefault(str(link['canonical_grant_id']), []).append({'grant_id': grant_id, 'similarity': link['similarity']})
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'run_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'duplicates': groups}, f, ensure_ascii=False, indent=4, default=str)
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {len(links)} duplicate links to {path}")
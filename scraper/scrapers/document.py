@@ -0,0 +1,90 @@
+import logging
+from scrapers.parsing import make_soup
+
+logger = logging.getLogger(__name__)
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4')
+
+class ParsedDocument:
+    """
+    A page parsed once and shared by every extractor.
+    The full text, the strings in the page, element lookups and heading sections are computed on first
+    use and cached, so extractors asking for the same thing do not walk the tree again.
+    """
+
+    def __init__(self, soup):
+        self.soup = soup
+        self._text = None
+        self._strings = None
+        self._elements = {}
+        self._sections = {}
+        self._memo = {}
+
+    @classmethod
+    def from_html(cls, html, **kwargs):
+        return cls(make_soup(html, **kwargs))
+
+    @property
+    def text(self):
+        # full page text, equivalent to soup.get_text()
+        if self._text is None:
+            self._text = self.soup.get_text()
+        return self._text
+
+    @property
+    def strings(self):
+        # every text node in document order
+        if self._strings is None:
+            self._strings = self.soup.find_all(string=True)
+        return self._strings
+
+    def find_string(self, pattern):
+        # first text node matching a compiled regex, like soup.find(string=pattern)
+        for string in self.strings:
+            if pattern.search(string):
+                return string
+        return None
+
+    def find_all(self, *names):
+        # all elements with the given tag names, in document order
+        if names not in self._elements:
+            self._elements[names] = self.soup.find_all(list(names))
+        return self._elements[names]
+
+    def find(self, name):
+        # first element with the given tag name; headings come from the cached heading list
+        if name in HEADING_TAGS:
+            return next((heading for heading in self.headings if heading.name == name), None)
+        elements = self.find_all(name)
+        return elements[0] if elements else None
+
+    @property
+    def headings(self):
+        return self.find_all(*HEADING_TAGS)
+
+    def find_heading(self, text):
+        # first h1-h4 whose text contains the given string
+        for heading in self.headings:
+            if text in heading.text:
+                return heading
+        return None
+
+    def section(self, heading):
+        """
+        Sibling elements following a heading, up to the next h1-h4
+        """
+        key = id(heading)
+        if key not in self._sections:
+            content = []
+            for sibling in heading.find_next_siblings():
+                if sibling.name in HEADING_TAGS:
+                    break
+                content.append(sibling)
+            self._sections[key] = content
+        return self._sections[key]
+
+    def memo(self, key, compute):
+        # cache an extractor's result for this page
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
@@ -0,0 +1,112 @@
+import re
+import logging
+from datetime import datetime
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# formats tried by parse_date when the caller does not name any
+DATE_FORMATS = ('%B %d, %Y', '%B %d %Y', '%d %B %Y', '%b %d, %Y', '%b %d %Y', '%Y-%m-%d')
+
+ISO_DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+# free-text date patterns, tried in order: (pattern, group holding the date, format after removing commas)
+DATE_PATTERNS = [
+    (re.compile(r'(\w+ \d{1,2},? \d{4})'), 1, '%B %d %Y'),
+    (re.compile(r'(\d{1,2} \w+ \d{4})'), 1, '%d %B %Y'),
+    (re.compile(r'(\d{1,2}:\d{2}\s*(?:am|pm|AM|PM))\s+\w+\s+on\s+(\w+ \d{1,2},? \d{4})'), 2, '%B %d %Y'),
+]
+
+# phrases that introduce a deadline, tried before searching the whole text for a date
+DEADLINE_PATTERNS = [
+    re.compile(r'[Aa]pplications\s+must\s+be\s+submitted\s+by\s+([^\.]+)'),
+    re.compile(r'[Dd]eadline[:\s]+([^\.]+)'),
+]
+
+# funding amount patterns, most specific first
+AMOUNT_PATTERNS = [
+    re.compile(r'up to \$\s*([\d,]+)', re.IGNORECASE),
+    re.compile(r'maximum of \$\s*([\d,]+)', re.IGNORECASE),
+    re.compile(r'total of \$\s*([\d,]+)', re.IGNORECASE),
+    re.compile(r'awarded \$\s*([\d,]+)', re.IGNORECASE),
+    re.compile(r'\$\s*([\d,]+)'),
+    re.compile(r'(\d[\d,]*)\s*(?:dollars|CAD)', re.IGNORECASE),
+]
+
+@lru_cache(maxsize=4096)
+def parse_date(date_str, *formats):
+    """
+    Normalize a date string to YYYY-MM-DD, trying each format in turn (DATE_FORMATS if none are given).
+    Returns None if no format matches.
+    """
+    date_str = date_str.strip()
+    for date_format in formats or DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+def parse_amount(amount_str):
+    # convert a matched amount such as "1,500,000" to a float
+    try:
+        return float(amount_str.replace(',', ''))
+    except ValueError:
+        return None
+
+def find_date(text):
+    """
+    Find the first recognizable date in free text and return it as YYYY-MM-DD
+    """
+    if not text:
+        return None
+
+    iso_match = ISO_DATE_RE.search(text)
+    if iso_match:
+        return iso_match.group(1)
+
+    for pattern, group, date_format in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            parsed = parse_date(match.group(group).replace(',', ''), date_format)
+            if parsed:
+                return parsed
+    return None
+
+def find_deadline(text):
+    """
+    Find a deadline, preferring dates introduced by "applications must be submitted by" or "deadline"
+    """
+    if not text:
+        return None
+
+    for pattern in DEADLINE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return find_date(match.group(1).strip())
+    return find_date(text)
+
+def find_amount(text, patterns=AMOUNT_PATTERNS):
+    """
+    Return the amount captured by the first matching pattern, as a float
+    """
+    if not text:
+        return None
+
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            amount = parse_amount(match.group(1))
+            if amount is not None:
+                return amount
+    return None
+
+def extract_batch(texts):
+    """
+    Extract the deadline and amount from many text blocks at once.
+    Identical blocks are only processed once; results are returned in input order.
+    """
+    results = {}
+    for text in dict.fromkeys(texts):
+        results[text] = {'deadline': find_deadline(text), 'amount': find_amount(text)}
+    return [dict(results[text]) for text in texts]
@@ -0,0 +1,62 @@
+import time
+import logging
+import requests
+from scrapers.throttle import host_rate_limiter, parse_retry_after
+from scrapers.http_cache import http_cache
+from scrapers.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+def fetch_url(transport, url, headers=None, binary=False, cache=http_cache, max_retries=3, timeout=30, source=None):
+    """
+    Fetch a page through the shared HTTP cache with adaptive per-host rate limiting and retries.
+    Failed attempts are retried after the host's Retry-After delay or a jittered exponential backoff;
+    client errors other than 408 and 429 are not retried.
+    `transport` is a requests.Session or one of the transports in scrapers/transport.py;
+    record and replay transports bypass the cache, and replay skips the rate limiter.
+    Status, size, latency and retries are recorded in the run metrics under `source`.
+    Returns the page text (or bytes when binary=True), or None if every attempt failed.
+    """
+    if not getattr(transport, 'use_cache', True):
+        cache = None
+    throttled = getattr(transport, 'throttled', True)
+    start = time.perf_counter()
+    
+    for attempt in range(max_retries):
+        try:
+            # pages already fetched in this run are served without waiting on the rate limiter
+            response = cache.peek(url) if cache else None
+            if response is None:
+                if throttled:
+                    metrics.observe(source, 'throttle.wait', host_rate_limiter.wait(url))
+                logger.info(f"Fetching {url}")
+                request_start = time.perf_counter()
+                if cache:
+                    response = cache.get(transport, url, headers=headers, timeout=timeout)
+                else:
+                    response = transport.get(url, headers=headers, timeout=timeout)
+                    response.raise_for_status()
+                if throttled:
+                    host_rate_limiter.record_response(url, time.perf_counter() - request_start)
+            metrics.record_fetch(
+                source, response.status_code, len(response.content), time.perf_counter() - start,
+                retries=attempt, from_cache=getattr(response, 'from_cache', False)
+            )
+            return response.content if binary else response.text
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching {url} (attempt {attempt+1}/{max_retries}): {e}")
+            status = getattr(e.response, 'status_code', None)
+            retryable = status is None or status >= 500 or status in (408, 429)
+            if attempt < max_retries - 1 and retryable:
+                if throttled:
+                    retry_after = parse_retry_after(e.response.headers.get('Retry-After')) if e.response is not None else None
+                    delay = host_rate_limiter.record_failure(url, attempt, status, retry_after)
+                    if delay > host_rate_limiter.backoff_cap:
+                        logger.error(f"Giving up on {url}: host asked us to wait {delay:.0f}s")
+                        metrics.record_fetch(source, status, 0, time.perf_counter() - start, retries=attempt)
+                        return None
+                    metrics.count(source, 'fetch.backoff')
+                    time.sleep(delay)
+            else:
+                metrics.record_fetch(source, status or 'error', 0, time.perf_counter() - start, retries=attempt)
+                return None
@@ -0,0 +1,116 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fingerprints.json")
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+def fingerprint(html, *parts):
+    """
+    Hash the normalized HTML body together with any extra inputs the parser depends on
+    (parser version, grant type, listing title...)
+    """
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(WHITESPACE_RE.sub(' ', html).strip().encode('utf-8'))
+    return digest.hexdigest()
+
+class FingerprintIndex:
+    """
+    Maps each page (source + url) to the fingerprint of its last parsed body and the record extracted from it,
+    so scrapers can skip tree building and extraction when a page has not changed
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_INDEX_PATH
+        self.lock = threading.Lock()
+        self.entries = None
+        self.dirty = False
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning(f"Error reading fingerprint index {self.path}, starting fresh: {e}")
+
+    def lookup(self, page_key, page_fingerprint):
+        # return a copy of the stored entry if the page is unchanged, otherwise None
+        with self.lock:
+            self._load()
+            entry = self.entries.get(page_key)
+            if not entry or entry.get('fingerprint') != page_fingerprint:
+                return None
+            return {
+                'record': dict(entry['record']),
+                'status': dict(entry.get('status') or {})
+            }
+
+    def store(self, page_key, page_fingerprint, record, status=None):
+        # remember the record extracted from this page, along with the inputs needed to recompute its status
+        with self.lock:
+            self._load()
+            self.entries[page_key] = {
+                'fingerprint': page_fingerprint,
+                'record': dict(record),
+                'status': status or {}
+            }
+            self.dirty = True
+
+    def status_inputs(self):
+        # grant_id -> the status inputs stored with that grant's page, for recomputing is_active offline
+        with self.lock:
+            self._load()
+            return {
+                entry['record']['grant_id']: dict(entry.get('status') or {})
+                for entry in self.entries.values()
+                if entry.get('record', {}).get('grant_id') is not None
+            }
+
+    def forget(self, grant_ids):
+        """
+        Drop the entries of these grants, so their pages are parsed in full if they are listed again and the
+        status sweep has no inputs to recompute them from; returns the number of entries dropped
+        """
+        grant_ids = set(grant_ids)
+        with self.lock:
+            self._load()
+            page_keys = [page_key for page_key, entry in self.entries.items()
+                         if entry.get('record', {}).get('grant_id') in grant_ids]
+            for page_key in page_keys:
+                del self.entries[page_key]
+            self.dirty = self.dirty or bool(page_keys)
+        return len(page_keys)
+
+    def save(self):
+        # write the index once per run rather than once per page
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self.dirty = False
+                logger.info(f"Saved fingerprint index to {self.path}")
+            except OSError as e:
+                logger.error(f"Error saving fingerprint index {self.path}: {e}")
+
+# shared by every scraper
+fingerprint_index = FingerprintIndex()
@@ -0,0 +1,172 @@
+import os
+import re
+import sys
+import heapq
+import hashlib
+import logging
+import itertools
+import threading
+from array import array
+from urllib.parse import urljoin, urlparse
+from scrapers.grant_ids import canonical_url, DATA_DIR
+from scrapers.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEEN_PATH = os.path.join(DATA_DIR, "seen_urls.bin")
+
+def url_hash(url):
+    # 64-bit hash of the canonical URL, so each remembered URL costs 8 bytes on disk
+    return int.from_bytes(hashlib.blake2b(canonical_url(url).encode('utf-8'), digest_size=8).digest(), 'big')
+
+class SeenSet:
+    """
+    Hashed canonical URLs fetched in previous runs, persisted as a flat file of 64-bit integers.
+    Used to crawl newly discovered URLs first and to count what is new since the last run.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_SEEN_PATH
+        self.lock = threading.Lock()
+        self.hashes = None
+        self.dirty = False
+
+    def _load(self):
+        if self.hashes is not None:
+            return
+        self.hashes = set()
+        if not os.path.exists(self.path):
+            return
+        try:
+            data = array('Q')
+            with open(self.path, 'rb') as f:
+                data.frombytes(f.read())
+            if sys.byteorder == 'big':
+                data.byteswap()
+            self.hashes = set(data)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Error reading seen URL set {self.path}: {e}")
+
+    def __contains__(self, url):
+        with self.lock:
+            self._load()
+            return url_hash(url) in self.hashes
+
+    def add(self, url):
+        # remember a URL; returns True if it was not seen before
+        key = url_hash(url)
+        with self.lock:
+            self._load()
+            if key in self.hashes:
+                return False
+            self.hashes.add(key)
+            self.dirty = True
+            return True
+
+    def __len__(self):
+        with self.lock:
+            self._load()
+            return len(self.hashes)
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                data = array('Q', sorted(self.hashes))
+                if sys.byteorder == 'big':
+                    data.byteswap()
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data.tobytes())
+                os.replace(tmp_path, self.path)
+                self.dirty = False
+            except OSError as e:
+                logger.error(f"Error saving seen URL set {self.path}: {e}")
+
+class LinkRules:
+    """
+    Link discovery rules for a source: which links on a listing page lead to more listing pages.
+    Links marked rel="next" are pagination; `follow` patterns match sub-listings and page parameters.
+    """
+
+    def __init__(self, follow=(), follow_next=True):
+        self.follow = [re.compile(pattern) for pattern in follow]
+        self.follow_next = follow_next
+
+    def discover(self, soup, page_url):
+        # absolute URLs of the listing pages linked from this page
+        for link in soup.find_all('a', href=True):
+            url = urljoin(page_url, link['href'])
+            if (self.follow_next and 'next' in (link.get('rel') or [])) or any(pattern.search(url) for pattern in self.follow):
+                yield url
+
+class CrawlFrontier:
+    """
+    Priority queue of listing pages to fetch for one source, de-duplicated by canonical URL.
+    Shallower pages come first and, at the same depth, URLs not seen in a previous run.
+    Crawling stops at max_depth links from the seeds and max_pages_per_host fetches per host,
+    and never leaves the seeds' hosts unless other hosts are allowed explicitly.
+    """
+
+    def __init__(self, seeds, rules=None, source=None, max_depth=2, max_pages_per_host=50, allowed_hosts=None, seen=None):
+        self.rules = rules or LinkRules()
+        self.source = source  # metrics label
+        self.max_depth = max_depth
+        self.max_pages_per_host = max_pages_per_host
+        self.allowed_hosts = set(allowed_hosts or ()) | {urlparse(seed).netloc.lower() for seed in seeds}
+        self.seen = seen if seen is not None else seen_url_set
+        self.queued = set()  # url hashes queued this run
+        self.pages_per_host = {}
+        self.truncated = 0  # listing pages left out by the depth or per-host limits
+        self.heap = []
+        self.order = itertools.count()  # keeps discovery order among equal priorities
+        for seed in seeds:
+            self.add(seed, 0)
+
+    def add(self, url, depth):
+        # queue a URL unless it is already queued this run or outside the crawl limits
+        if urlparse(url).netloc.lower() not in self.allowed_hosts:
+            return False
+        key = url_hash(url)
+        if key in self.queued:
+            return False
+        if depth > self.max_depth:
+            # pages are popped shallowest first, so a page this deep cannot still be queued at a lower depth
+            self.truncated += 1
+            return False
+        self.queued.add(key)
+        heapq.heappush(self.heap, (depth, url in self.seen, next(self.order), url))
+        return True
+
+    def pop(self):
+        """
+        Return the next (url, depth) to fetch, or None once the queue is empty
+        """
+        while self.heap:
+            depth, known, _, url = heapq.heappop(self.heap)
+            host = urlparse(url).netloc.lower()
+            if self.pages_per_host.get(host, 0) >= self.max_pages_per_host:
+                logger.warning(f"Skipping {url}: reached the limit of {self.max_pages_per_host} pages for {host}")
+                metrics.count(self.source, 'frontier.host_limit')
+                self.truncated += 1
+                continue
+            self.pages_per_host[host] = self.pages_per_host.get(host, 0) + 1
+            if self.seen.add(url):
+                metrics.count(self.source, 'frontier.new_urls')
+            return url, depth
+        return None
+
+    def discover(self, soup, page_url, depth):
+        # queue the listing pages linked from a fetched page; returns how many were new this run
+        added = sum(self.add(url, depth + 1) for url in self.rules.discover(soup, page_url))
+        if added:
+            logger.info(f"Queued {added} more listing pages from {page_url}")
+        return added
+
+    def __len__(self):
+        return len(self.heap)
+
+# shared by every scraper
+seen_url_set = SeenSet()
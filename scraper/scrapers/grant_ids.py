@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_REGISTRY_PATH = os.path.join(DATA_DIR, "grant_ids.json")
+
+# derived IDs live in source_id * ID_BLOCK + [0, ID_BLOCK), above the legacy counter ranges and within int4
+ID_BLOCK = 10 ** 8
+
+def canonical_url(url):
+    """
+    Normalize a URL so trivial variations map to the same grant:
+    lowercase scheme and host, no default port, fragment, tracking parameters or trailing slash, sorted query
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and not (scheme == 'http' and parts.port == 80) and not (scheme == 'https' and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query) if not key.lower().startswith('utm_')))
+    return urlunsplit((scheme, host, path, query, ''))
+
+def grant_key(source_id, url):
+    return f"{source_id}:{canonical_url(url)}"
+
+def derive_grant_id(source_id, url):
+    # deterministic ID from the source and canonical URL
+    digest = hashlib.sha256(grant_key(source_id, url).encode('utf-8')).hexdigest()
+    return source_id * ID_BLOCK + int(digest[:12], 16) % ID_BLOCK
+
+class GrantIdRegistry:
+    """
+    Persisted mapping of (source, canonical application URL) -> grant_id.
+    Existing grants keep the IDs they already have, and new grants get an ID derived from their URL,
+    so IDs no longer depend on the order pages are scraped in.
+    """
+
+    def __init__(self, path=None, seed_path=None):
+        self.path = path or DEFAULT_REGISTRY_PATH
+        self.seed_path = seed_path or os.path.join(DATA_DIR, "all_grants.json")
+        self.lock = threading.Lock()
+        self.ids = None
+        self.taken = set()  # every assigned grant_id, so collision checks don't rebuild it per new grant
+        self.dirty = False
+
+    def _load(self):
+        if self.ids is not None:
+            return
+        self.ids = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.ids = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning(f"Error reading grant ID registry {self.path}: {e}")
+                self._seed()
+        else:
+            self._seed()
+        self.taken = set(self.ids.values())
+
+    def _seed(self):
+        # keep the IDs of grants saved before the registry existed
+        if not os.path.exists(self.seed_path):
+            return
+        try:
+            with open(self.seed_path, 'r', encoding='utf-8') as f:
+                grants = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Error reading {self.seed_path} to seed grant IDs: {e}")
+            return
+        for grant in grants:
+            if grant.get('application_url') and grant.get('grant_id') is not None:
+                self.ids.setdefault(grant_key(grant['source_id'], grant['application_url']), grant['grant_id'])
+        self.dirty = True
+        logger.info(f"Seeded grant ID registry with {len(self.ids)} existing grants")
+
+    def get_id(self, source_id, url):
+        # return the grant_id for this source and URL, assigning a new one if needed
+        key = grant_key(source_id, url)
+        with self.lock:
+            self._load()
+            if key in self.ids:
+                return self.ids[key]
+
+            grant_id = derive_grant_id(source_id, url)
+            block_start = source_id * ID_BLOCK
+            while grant_id in self.taken:
+                # probe forward within the source's block on the rare hash collision
+                grant_id = block_start + (grant_id - block_start + 1) % ID_BLOCK
+            self.ids[key] = grant_id
+            self.taken.add(grant_id)
+            self.dirty = True
+            logger.info(f"Assigned grant_id {grant_id} to {key}")
+            return grant_id
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.ids, f, ensure_ascii=False, indent=4, sort_keys=True)
+                os.replace(tmp_path, self.path)
+                self.dirty = False
+            except OSError as e:
+                logger.error(f"Error saving grant ID registry {self.path}: {e}")
+
+# shared by every scraper
+grant_id_registry = GrantIdRegistry()
@@ -1,177 +1,218 @@
-import requests
-from bs4 import BeautifulSoup
-import re
-from datetime import datetime
+from bs4 import SoupStrainer
+from datetime import datetime, date
 import logging
-import time
 import os
-from urllib.parse import urljoin
+import asyncio
+from urllib.parse import urljoin, urlparse
+from scrapers.fetcher import fetch_url
+from scrapers.transport import get_transport
+from scrapers.metrics import metrics, timed
+from scrapers.pipeline import inline_parser
+from scrapers.parsing import make_soup
+from scrapers.document import ParsedDocument
+from scrapers.extraction import find_date, find_deadline, find_amount
+from scrapers.fingerprints import fingerprint, fingerprint_index
+from scrapers.grant_ids import grant_id_registry
+from scrapers.frontier import CrawlFrontier, LinkRules, url_hash, seen_url_set
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class HealthCanadaGrantScraper:
-    def __init__(self, base_url=None):
+    # bump when extraction logic changes so stored fingerprints are invalidated
+    parser_version = 5
+    # label for this source in the run metrics
+    metrics_source = 'hc'
+    # source_id stored on this source's grants
+    source_id = 1
+    # listing pages worth following from the main page: pagination and other funding opportunity listings
+    link_rules = LinkRules(follow=[r'[?&]page=\d+', r'/funding-opportunities/[^/]*funding-opportunities[^/]*\.html$'])
+    
+    def __init__(self, base_url=None, fetch_mode='sync', max_concurrency=4, id_registry=None, fingerprints=None, transport=None, parse_pool=None,
+                 seen_urls=None, max_depth=2, max_listing_pages=50):
         self.base_url = base_url or "https://www.canada.ca/en/public-health/services/funding-opportunities/grant-contribution-funding-opportunities.html"
-        self.session = requests.Session()
+        self.transport = transport or get_transport()  # live, record or replay (see scrapers/transport.py)
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         }
         self.grants = []
-        self.next_grant_id = 1  # start at 1 for health canada
+        self.listed_ids = None  # grant ids on the listing, set once every listing page was crawled
+        self.id_registry = id_registry or grant_id_registry  # stable grant IDs keyed by source and url
+        self.fingerprints = fingerprints or fingerprint_index  # page fingerprints from previous runs
+        self.parse_pool = parse_pool or inline_parser  # where pages are parsed (see scrapers/pipeline.py)
+        self.seen_urls = seen_urls if seen_urls is not None else seen_url_set  # listing and grant URLs from previous runs
+        # crawl limits for listing pages (see scrapers/frontier.py)
+        self.max_depth = max_depth
+        self.max_listing_pages = max_listing_pages
+        # 'sync' fetches detail pages one by one, 'async' fetches them concurrently
+        self.fetch_mode = fetch_mode
+        self.max_concurrency = max_concurrency  # max in-flight requests per host
     
     def fetch_page(self, url):
-        # fetch html content
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"Fetching {url}")
-                response = self.session.get(url, headers=self.headers, timeout=30)
-                response.raise_for_status()
-                return response.text
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching {url} (attempt {attempt+1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2)  # Wait before retrying
-                else:
-                    return None
+        # fetch html content through the shared cache
+        return fetch_url(self.transport, url, headers=self.headers, source=self.metrics_source)
     
-    def parse_funding_opportunities(self):
-        # find all open funding opportunities 
-        html = self.fetch_page(self.base_url)
-        if not html:
-            logger.error("Failed to fetch the main funding opportunities page")
-            return []
+    async def _fetch_pages_async(self, urls):
+        # fetch several pages concurrently, limited per host by a semaphore
+        semaphores = {}
+        for url in urls:
+            host = urlparse(url).netloc
+            if host not in semaphores:
+                semaphores[host] = asyncio.Semaphore(self.max_concurrency)
         
-        soup = BeautifulSoup(html, 'html.parser')
-        opportunities = []
+        async def fetch_one(url):
+            async with semaphores[urlparse(url).netloc]:
+                # fetch_page is blocking, so run it in a worker thread
+                return await asyncio.to_thread(self.fetch_page, url)
         
-        opportunities_table = soup.find('table')
-        if not opportunities_table:
-            logger.warning("No opportunities table found on the page")
+        return await asyncio.gather(*(fetch_one(url) for url in urls))
+    
+    def fetch_pages_concurrently(self, urls):
+        # fetch html for every url and return the results in the same order
+        if not urls:
             return []
+        logger.info(f"Fetching {len(urls)} pages concurrently (max {self.max_concurrency} per host)")
+        return list(asyncio.run(self._fetch_pages_async(urls)))
+    
+    def parse_funding_opportunities(self):
+        # find all open funding opportunities, following pagination and linked sub-listings
+        frontier = CrawlFrontier([self.base_url], rules=self.link_rules, source=self.metrics_source,
+                                 max_depth=self.max_depth, max_pages_per_host=self.max_listing_pages, seen=self.seen_urls)
+        opportunities = []
+        found = set()  # url hashes, so a grant listed on several pages is only scraped once
+        complete = True  # every listing page was fetched and had an opportunities table
         
-        rows = opportunities_table.find_all('tr')[1:]
-        for row in rows:
-            cols = row.find_all('td')
-            if len(cols) >= 2:
-                link = cols[0].find('a')
-                if link:
-                    title = link.text.strip()
-                    url = urljoin(self.base_url, link['href'])
-                    status = cols[1].text.strip()
-                    
-                    # only process opportunities with "open" status
-                    if status.lower() == 'open':
-                        opportunities.append({
-                            'title': title,
-                            'url': url,
-                            'status': status
-                        })
+        while True:
+            entry = frontier.pop()
+            if entry is None:
+                break
+            url, depth = entry
+            
+            html = self.fetch_page(url)
+            if not html:
+                if url == self.base_url:
+                    logger.error("Failed to fetch the main funding opportunities page")
+                else:
+                    logger.warning(f"Failed to fetch listing page {url}")
+                complete = False
+                continue
+            
+            # only the listing tables and links are needed, so skip building the rest of the page
+            with metrics.timer(self.metrics_source, 'parse'):
+                soup = make_soup(html, parse_only=SoupStrainer(['table', 'a']))
+            frontier.discover(soup, url, depth)
+            
+            tables = soup.find_all('table')
+            if not tables:
+                logger.warning(f"No opportunities table found on {url}")
+                complete = False
+                continue
+            
+            for table in tables:
+                rows = table.find_all('tr')[1:]
+                for row in rows:
+                    cols = row.find_all('td')
+                    if len(cols) >= 2:
+                        link = cols[0].find('a')
+                        if link:
+                            title = link.text.strip()
+                            opportunity_url = urljoin(url, link['href'])
+                            status = cols[1].text.strip()
+                            
+                            # only process opportunities with "open" status
+                            key = url_hash(opportunity_url)
+                            if status.lower() == 'open' and key not in found:
+                                found.add(key)
+                                opportunities.append({
+                                    'title': title,
+                                    'url': opportunity_url,
+                                    'status': status
+                                })
         
-        logger.info(f"Found {len(opportunities)} open funding opportunities")
+        if complete and opportunities and not frontier.truncated:
+            self.listed_ids = {self.id_registry.get_id(self.source_id, opportunity['url']) for opportunity in opportunities}
+        else:
+            logger.warning("Listing was not crawled completely; no Health Canada grant will be marked removed this run")
+        
+        new = sum(self.seen_urls.add(opportunity['url']) for opportunity in opportunities)
+        self.seen_urls.save()
+        logger.info(f"Found {len(opportunities)} open funding opportunities ({new} new since the last run)")
         return opportunities
     
+    def listed_grant_ids(self):
+        # grant ids of every open opportunity on the listing, or None if the listing was not crawled completely
+        return self.listed_ids
+    
+    @timed('extract.date')
     def extract_date_from_text(self, text):
         # extract deadline date from text with multiple formats support
-        if not text:
-            return None
-        
-        submission_match = re.search(r'[Aa]pplications\s+must\s+be\s+submitted\s+by\s+([^\.]+)', text)
-        if submission_match:
-            date_text = submission_match.group(1).strip()
-            return self._parse_date_formats(date_text)
-        
-        # look for deadline explicitly mentioned
-        deadline_match = re.search(r'[Dd]eadline[:\s]+([^\.]+)', text)
-        if deadline_match:
-            date_text = deadline_match.group(1).strip()
-            return self._parse_date_formats(date_text)
-            
-        return self._parse_date_formats(text)
+        return find_deadline(text)
     
     def _parse_date_formats(self, text):
         # helper method to parse various date formats
-        date_match = re.search(r'(\d{4}-\d{2}-\d{2})', text)
-        if date_match:
-            return date_match.group(1)
-        
-        month_day_year = re.search(r'(\w+ \d{1,2},? \d{4})', text)
-        if month_day_year:
-            date_str = month_day_year.group(1).replace(',', '')
-            try:
-                parsed_date = datetime.strptime(date_str, '%B %d %Y')
-                return parsed_date.strftime('%Y-%m-%d')
-            except ValueError:
-                pass
-        
-        day_month_year = re.search(r'(\d{1,2} \w+ \d{4})', text)
-        if day_month_year:
-            date_str = day_month_year.group(1)
-            try:
-                parsed_date = datetime.strptime(date_str, '%d %B %Y')
-                return parsed_date.strftime('%Y-%m-%d')
-            except ValueError:
-                pass
-        
-        time_date = re.search(r'(\d{1,2}:\d{2}\s*(?:am|pm|AM|PM))\s+\w+\s+on\s+(\w+ \d{1,2},? \d{4})', text)
-        if time_date:
-            date_str = time_date.group(2).replace(',', '')
-            try:
-                parsed_date = datetime.strptime(date_str, '%B %d %Y')
-                return parsed_date.strftime('%Y-%m-%d')
-            except ValueError:
-                pass
-                
-        return None
+        return find_date(text)
     
+    @timed('extract.amount')
     def extract_amount_from_text(self, text):
         # extract funding amount from text
-        if not text:
-            return None
-        
-        specific_patterns = [
-            r'up to \$\s*([\d,]+)',
-            r'maximum of \$\s*([\d,]+)',
-            r'total of \$\s*([\d,]+)',
-            r'awarded \$\s*([\d,]+)'
-        ]
-        
-        for pattern in specific_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                amount_str = match.group(1).replace(',', '')
-                return float(amount_str)
-        
-        amount_match = re.search(r'\$\s*([\d,]+)', text)
-        if amount_match:
-            amount_str = amount_match.group(1).replace(',', '')
-            return float(amount_str)
-            
-        amount_match = re.search(r'(\d[\d,]*)\s*(dollars|CAD)', text, re.IGNORECASE)
-        if amount_match:
-            amount_str = amount_match.group(1).replace(',', '')
-            return float(amount_str)
-            
-        return None
+        return find_amount(text)
     
-    def parse_grant_details(self, opportunity):
+    def parse_grant_details(self, opportunity, html=None):
         # extract detailed information from an individual grant page
-        html = self.fetch_page(opportunity['url'])
+        # html can be passed in when the page was already fetched
+        if html is None:
+            html = self.fetch_page(opportunity['url'])
         if not html:
             logger.error(f"Failed to fetch details for {opportunity['title']}")
             return None
+        return self.finish_grant_details(self.start_grant_details(opportunity, html))
+    
+    def start_grant_details(self, opportunity, html):
+        """
+        Look up the grant ID and page fingerprint, then hand the page to the parse pool unless it is
+        unchanged since the last run. Returns a job for finish_grant_details.
+        """
+        job = {
+            'opportunity': opportunity,
+            # look up the stable grant id for this opportunity
+            'grant_id': self.id_registry.get_id(self.source_id, opportunity['url']),
+            'page_key': f"hc:{opportunity['url']}",
+            'fingerprint': fingerprint(html, self.parser_version, opportunity['title'])
+        }
+        # reuse the previous record if the page is unchanged since the last run
+        job['cached'] = self.fingerprints.lookup(job['page_key'], job['fingerprint'])
+        if not job['cached']:
+            job['future'] = self.parse_pool.submit(self, 'extract_grant_details', opportunity, html)
+        return job
+    
+    def finish_grant_details(self, job):
+        # wait for the parsed record, attach its grant id and remember the page fingerprint
+        grant_id = job['grant_id']
+        if job['cached']:
+            metrics.count(self.metrics_source, 'pages.unchanged')
+            grant_data = job['cached']['record']
+            grant_data['grant_id'] = grant_id
+            grant_data['crawled_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            grant_data['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            grant_data['is_active'] = self.status_from_inputs(self.status_inputs(grant_data))
+            logger.info(f"Page unchanged, reused details for: {grant_data['title']} (ID: {grant_id})")
+            return grant_data
         
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # create a unique sequential grant id
-        grant_id = self.next_grant_id
-        self.next_grant_id += 1
+        grant_data = job['future'].result()
+        grant_data['grant_id'] = grant_id
+        self.fingerprints.store(job['page_key'], job['fingerprint'], grant_data, self.status_inputs(grant_data))
+        logger.info(f"Parsed details for: {grant_data['title']} (ID: {grant_id})")
+        return grant_data
+    
+    def extract_grant_details(self, opportunity, html):
+        # build the grant record from a detail page; runs in a parse pool worker when one is configured
+        with metrics.timer(self.metrics_source, 'parse'):
+            doc = ParsedDocument.from_html(html)
         
         # initialize grant data with default values
         grant_data = {
-            'grant_id': grant_id,
-            'source_id': 1,  # Simple integer 1 for Health Canada
+            'grant_id': None,  # assigned by finish_grant_details in the main process
+            'source_id': self.source_id,  # Simple integer 1 for Health Canada
             'crawled_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'title': opportunity['title'],
             'description': '',
@@ -185,7 +226,7 @@ class HealthCanadaGrantScraper:
             'assignee': ''
         }
         
-        main_title = soup.find('h1')
+        main_title = doc.find('h1')
         if main_title:
             grant_data['title'] = main_title.text.strip()
         
@@ -200,27 +241,26 @@ class HealthCanadaGrantScraper:
         }
         
         # find all headings and extract their content
-        headings = soup.find_all(['h1', 'h2', 'h3', 'h4'])
-        for heading in headings:
-            section_name = heading.text.strip()
-            
-            for key in sections.keys():
-                if key.lower() in section_name.lower():
-                    content = []
-                    for sibling in heading.find_next_siblings():
-                        if sibling.name in ['h1', 'h2', 'h3', 'h4']:
-                            break
-                        if sibling.name in ['p', 'li', 'ul', 'ol']:
-                            content.append(sibling.text.strip())
-                    
-                    sections[key] = '\n'.join(content)
+        with metrics.timer(self.metrics_source, 'extract.sections'):
+            for heading in doc.headings:
+                section_name = heading.text.strip()
+                
+                for key in sections.keys():
+                    if key.lower() in section_name.lower():
+                        content = []
+                        for sibling in doc.section(heading):
+                            if sibling.name in ['p', 'li', 'ul', 'ol']:
+                                content.append(sibling.text.strip())
+                        
+                        sections[key] = '\n'.join(content)
         
         # extract description from overview section
         if sections['Overview']:
             grant_data['description'] = sections['Overview']
         else:
             # fallback: try to get description from first paragraph after title
-            first_para = soup.find('h1').find_next('p')
+            metrics.count(self.metrics_source, 'fallback.description_first_paragraph')
+            first_para = main_title.find_next('p') if main_title else None
             if first_para:
                 grant_data['description'] = first_para.text.strip()
         
@@ -237,29 +277,74 @@ class HealthCanadaGrantScraper:
             if deadline_date:
                 grant_data['deadline'] = deadline_date
         
-        logger.info(f"Parsed details for: {grant_data['title']} (ID: {grant_id})")
+        grant_data['is_active'] = self.status_from_inputs(self.status_inputs(grant_data))
         return grant_data
     
+    def status_inputs(self, grant_data):
+        # the facts that decide whether the grant is active; stored with the page fingerprint
+        return {'deadline': grant_data.get('deadline')}
+    
+    def status_from_inputs(self, inputs, today=None):
+        # a grant listed as open stays active until its deadline has passed
+        deadline = inputs.get('deadline')
+        today = today or date.today()
+        if deadline and datetime.strptime(deadline[:10], '%Y-%m-%d').date() < today:
+            logger.info(f"Grant marked as inactive: deadline {deadline[:10]} has passed")
+            return False
+        return True
+    
     def scrape_grants(self):
         # main method to scrape all open grant opportunities
         opportunities = self.parse_funding_opportunities()
         
+        if self.fetch_mode == 'async':
+            return self._scrape_grants_async(opportunities)
+        
+        # pages are parsed (in the parse pool, if any) while the next ones are fetched
+        jobs = []
         for i, opportunity in enumerate(opportunities):
             logger.info(f"Processing opportunity {i+1}/{len(opportunities)}: {opportunity['title']}")
             
-            # delay
-            if i > 0:
-                time.sleep(2)
-                
-            grant_data = self.parse_grant_details(opportunity)
-            if grant_data:
-                self.grants.append(grant_data)
-            else:
-                logger.warning(f"Failed to parse grant details for: {opportunity['title']}")
+            # requests are paced by the shared per-host rate limiter in fetch_url
+            html = self.fetch_page(opportunity['url'])
+            if not html:
+                logger.error(f"Failed to fetch details for {opportunity['title']}")
+                continue
+            jobs.append(self.start_grant_details(opportunity, html))
         
-        logger.info(f"Completed scraping {len(self.grants)} grants")
+        self._finish_jobs(jobs)
         return self.grants
     
+    def _scrape_grants_async(self, opportunities):
+        # fetch all detail pages concurrently, then parse them in listing order
+        pages = self.fetch_pages_concurrently([opportunity['url'] for opportunity in opportunities])
+        
+        jobs = []
+        for i, (opportunity, html) in enumerate(zip(opportunities, pages)):
+            logger.info(f"Processing opportunity {i+1}/{len(opportunities)}: {opportunity['title']}")
+            
+            if not html:
+                logger.error(f"Failed to fetch details for {opportunity['title']}")
+                continue
+            jobs.append(self.start_grant_details(opportunity, html))
+        
+        self._finish_jobs(jobs)
+        return self.grants
+    
+    def _finish_jobs(self, jobs):
+        # collect parsed grants in listing order, then persist fingerprints and ids once
+        # one bad page is logged and skipped so the rest of the batch is still collected
+        for job in jobs:
+            try:
+                self.grants.append(self.finish_grant_details(job))
+            except Exception as e:
+                logger.error(f"Failed to parse grant details for {job['opportunity']['title']}: {e}")
+        
+        self.fingerprints.save()
+        self.id_registry.save()
+        logger.info(f"Completed scraping {len(self.grants)} grants")
+    
+    @timed('save.local')
     def save_data(self):
         # save the scraped grant data using the utility function
         if not self.grants:
@@ -267,10 +352,8 @@ class HealthCanadaGrantScraper:
             return
         
         try:
-            from scrapers.utils import save_grant_data
-            for grant in self.grants:
-                grant_name = f"HC_{grant['title'].replace(' ', '_')[:50]}"  # Limit filename length
-                save_grant_data(grant, grant_name)
+            from scrapers.utils import save_grants
+            save_grants(self.grants)
             logger.info(f"Successfully saved {len(self.grants)} grants")
         except Exception as e:
             logger.error(f"Error saving grant data: {e}")
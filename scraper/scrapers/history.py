@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import threading
+from datetime import datetime, date, time
+import pandas as pd
+from scrapers.storage import GRANT_COLUMNS, format_grant, grant_signature
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "history")
+
+# parquet column types; everything else is stored as text
+COLUMN_TYPES = {'grant_id': 'int64', 'source_id': 'int64', 'amount': 'float64', 'is_active': 'bool'}
+
+def frame_to_grants(frame):
+    # rows of a history frame as grant dicts, with missing values as None and without the run_at column
+    frame = frame.drop(columns=['run_at'], errors='ignore').astype(object)
+    return frame.where(frame.notna(), None).to_dict('records')
+
+def _cutoff(when):
+    # latest run time included by as_of: a date or 'YYYY-MM-DD' covers the whole day
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when) if len(when) > 10 else date.fromisoformat(when)
+    if not isinstance(when, datetime):
+        when = datetime.combine(when, time.max)
+    return when
+
+class GrantHistory:
+    """
+    Append-only Parquet snapshot of every run, partitioned by run date:
+    data/history/run_date=YYYY-MM-DD/run-HHMMSSffffff.parquet, zstd-compressed.
+    index.json lists each snapshot with the sources it covers and, for every grant, the snapshots
+    in which its content changed, so as_of and grant_history only open the files they need.
+    """
+
+    def __init__(self, history_dir=None, compression='zstd'):
+        self.history_dir = history_dir or DEFAULT_HISTORY_DIR
+        self.index_path = os.path.join(self.history_dir, "index.json")
+        self.compression = compression
+        self.lock = threading.Lock()
+        self.index = None
+
+    def _load_index(self):
+        if self.index is not None:
+            return
+        self.index = {'snapshots': [], 'versions': {}}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning(f"Error reading history index {self.index_path}: {e}")
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def append(self, grants, run_at=None):
+        """
+        Store one run's grants as a new snapshot; returns the snapshot's path relative to the history directory
+        """
+        run_at = run_at or datetime.now()
+        frame = pd.DataFrame([format_grant(grant) for grant in grants], columns=GRANT_COLUMNS)
+        frame = frame.astype({column: dtype for column, dtype in COLUMN_TYPES.items()})
+        frame['run_at'] = pd.Timestamp(run_at)
+
+        relative_path = os.path.join(f"run_date={run_at:%Y-%m-%d}", f"run-{run_at:%H%M%S%f}.parquet")
+        path = os.path.join(self.history_dir, relative_path)
+        with self.lock:
+            self._load_index()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            frame.to_parquet(tmp_path, index=False, compression=self.compression)
+            os.replace(tmp_path, path)
+
+            self.index['snapshots'].append({
+                'path': relative_path,
+                'run_at': run_at.isoformat(),
+                'rows': len(frame),
+                'sources': sorted({int(source_id) for source_id in frame['source_id']})
+            })
+            for grant in grants:
+                versions = self.index['versions'].setdefault(str(grant['grant_id']), [])
+                signature = grant_signature(grant)
+                if not versions or versions[-1][1] != signature:
+                    versions.append([relative_path, signature])
+            self._save_index()
+        logger.info(f"Appended {len(frame)} grants to history snapshot {path}")
+        return relative_path
+
+    def snapshots(self):
+        # every snapshot's path, run time, row count and sources, oldest first
+        with self.lock:
+            self._load_index()
+            return list(self.index['snapshots'])
+
+    def _read(self, relative_path, filters):
+        return pd.read_parquet(os.path.join(self.history_dir, relative_path), engine='pyarrow', filters=filters)
+
+    def _concat(self, frames):
+        if not frames:
+            return pd.DataFrame(columns=GRANT_COLUMNS + ['run_at'])
+        return pd.concat(frames, ignore_index=True)
+
+    def as_of(self, when, sources=None):
+        """
+        Grants as they stood at `when` (a date, datetime or ISO string; a date includes that whole day).
+        Each source comes from its latest snapshot taken by then, so runs limited with --only still count.
+        Pass a list of source_ids as `sources` to only read those.
+        """
+        cutoff = _cutoff(when)
+        latest = {}
+        for snapshot in self.snapshots():
+            if datetime.fromisoformat(snapshot['run_at']) <= cutoff:
+                for source_id in snapshot['sources']:
+                    if sources is None or source_id in sources:
+                        latest[source_id] = snapshot['path']
+
+        sources_by_path = {}
+        for source_id, path in latest.items():
+            sources_by_path.setdefault(path, []).append(source_id)
+        frames = [self._read(path, [('source_id', 'in', source_ids)]) for path, source_ids in sources_by_path.items()]
+        return self._concat(frames).sort_values(['source_id', 'grant_id'], ignore_index=True)
+
+    def grant_history(self, grant_id):
+        """
+        Every distinct version of one grant, oldest first, with the run it was first seen in (run_at).
+        Only the snapshots where the grant changed are read.
+        """
+        with self.lock:
+            self._load_index()
+            versions = list(self.index['versions'].get(str(grant_id), []))
+        frames = [self._read(path, [('grant_id', '=', int(grant_id))]) for path, _ in versions]
+        return self._concat(frames).sort_values('run_at', ignore_index=True)
+
+# shared by the runner
+history_store = GrantHistory()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the grant history snapshots")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--as-of', help="show every grant as of this date (YYYY-MM-DD)")
+    group.add_argument('--grant', type=int, help="show how one grant_id changed over time")
+    group.add_argument('--snapshots', action='store_true', help="list the stored snapshots")
+    args = parser.parse_args(argv)
+
+    if args.snapshots:
+        frame = pd.DataFrame(history_store.snapshots())
+    elif args.as_of:
+        frame = history_store.as_of(args.as_of)
+    else:
+        frame = history_store.grant_history(args.grant)
+    frame.to_csv(sys.stdout, index=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "http_cache")
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024  # 50 MB
+
+class CachedResponse:
+    """Minimal response object returned by HttpCache, whether the body came from the network or disk"""
+
+    def __init__(self, url, status_code, content, headers=None, encoding=None, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.encoding = encoding or 'utf-8'
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def raise_for_status(self):
+        # same contract as requests.Response.raise_for_status
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+class HttpCache:
+    """
+    Persistent HTTP cache shared by all scrapers.
+    Bodies are revalidated with If-None-Match / If-Modified-Since, 304 responses are served
+    from disk, and repeated requests for the same URL within a run are coalesced into one.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.url_locks = {}
+        self.responses = {}  # responses already fetched during this run
+        self.index = None
+
+    def _load_index(self):
+        # load the cache index lazily, starting fresh if it is missing or unreadable
+        if self.index is not None:
+            return
+        self.index = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning(f"Error reading HTTP cache index {self.index_path}, starting fresh: {e}")
+
+    def _save_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _body_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + ".body")
+
+    def _url_lock(self, url):
+        with self.lock:
+            return self.url_locks.setdefault(url, threading.Lock())
+
+    def peek(self, url):
+        # return the response already fetched for this url during the current run, if any
+        return self.responses.get(url)
+
+    def get(self, session, url, headers=None, timeout=30):
+        # fetch a url through the cache with a session or transport, raising requests exceptions on failure
+        with self._url_lock(url):
+            if url in self.responses:
+                return self.responses[url]
+
+            with self.lock:
+                self._load_index()
+                entry = self.index.get(url)
+
+            request_headers = dict(headers or {})
+            body_path = self._body_path(url)
+            if entry and os.path.exists(body_path):
+                if entry.get('etag'):
+                    request_headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    request_headers['If-Modified-Since'] = entry['last_modified']
+
+            response = session.get(url, headers=request_headers, timeout=timeout)
+
+            if response.status_code == 304 and entry and os.path.exists(body_path):
+                logger.info(f"Serving {url} from cache (304 Not Modified)")
+                with open(body_path, 'rb') as f:
+                    content = f.read()
+                with self.lock:
+                    entry['last_used'] = time.time()
+                    self._save_index()
+                result = CachedResponse(url, 200, content, entry.get('headers'), entry.get('encoding'), from_cache=True)
+            else:
+                response.raise_for_status()
+                encoding = response.encoding or response.apparent_encoding
+                result = CachedResponse(url, response.status_code, response.content, dict(response.headers), encoding)
+                self._store(url, response, encoding)
+
+            self.responses[url] = result
+            return result
+
+    def _store(self, url, response, encoding):
+        # only responses with validators can be revalidated later, so skip the rest
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        body_path = self._body_path(url)
+        tmp_path = f"{body_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, body_path)
+
+        with self.lock:
+            self._load_index()
+            self.index[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'encoding': encoding,
+                'headers': {'Content-Type': response.headers.get('Content-Type', '')},
+                'size': len(response.content),
+                'last_used': time.time()
+            }
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        # drop least recently used entries until the cache fits within max_bytes
+        total = sum(entry.get('size', 0) for entry in self.index.values())
+        if total <= self.max_bytes:
+            return
+
+        for url, entry in sorted(self.index.items(), key=lambda item: item[1].get('last_used', 0)):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._body_path(url))
+            except FileNotFoundError:
+                pass
+            total -= entry.get('size', 0)
+            del self.index[url]
+            logger.info(f"Evicted {url} from HTTP cache")
+
+# shared by every scraper so duplicate requests within a run are coalesced
+http_cache = HttpCache()
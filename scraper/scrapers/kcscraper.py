@@ -1,5 +1,3 @@
-import requests
-from bs4 import BeautifulSoup
 import re
 from datetime import datetime
 import logging
@@ -7,44 +5,72 @@ import os
 import time
 from urllib.parse import urljoin
 import json
+from scrapers.fetcher import fetch_url
+from scrapers.transport import get_transport
+from scrapers.metrics import metrics, timed
+from scrapers.pipeline import inline_parser
+from scrapers.document import ParsedDocument
+from scrapers.extraction import parse_date, find_amount
+from scrapers.fingerprints import fingerprint, fingerprint_index
+from scrapers.grant_ids import grant_id_registry
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# patterns for the Important Dates section
+OPEN_DATE_RE = re.compile(r'([A-Za-z]+ \d{1,2}, \d{4}):\s*Application window opens')
+CLOSE_DATE_RE = re.compile(r'([A-Za-z]+ \d{1,2}, \d{4})(?:.*?):\s*Application window closes')
+OPEN_NO_YEAR_RE = re.compile(r'([A-Za-z]+ \d{1,2})(?:\s+at\s+.*?)?:\s*Application window opens')
+CLOSE_NO_YEAR_RE = re.compile(r'([A-Za-z]+ \d{1,2})(?:\s+at\s+.*?)?:\s*Application window closes')
+ALT_CLOSE_RE = re.compile(r'([A-Za-z]+ \d{1,2}, \d{4})\s*at\s*\d+(?:am|pm|AM|PM)\s*[A-Z]+\s*:\s*Application window closes')
+# fallback patterns searched in the full page text
+WINDOW_OPENS_RE = re.compile(r'[Aa]pplication\s+window\s+opens[:\s]*([A-Za-z]+ \d{1,2},? \d{4})')
+WINDOW_CLOSES_RE = re.compile(r'[Aa]pplication\s+window\s+closes[:\s]*([A-Za-z]+ \d{1,2},? \d{4})')
+
+# patterns for the Overall Information section
+SECTION_PER_GRANT_RE = re.compile(r'maximum of \$(\d{1,3}(?:,\d{3})*) per grant')
+TOTAL_FUNDING_RE = re.compile(r'\$(\d{1,3}(?:,\d{3})*) in total funding')
+# fallback per-grant patterns searched in the full page text
+PER_GRANT_PATTERNS = [
+    re.compile(r'maximum of \$(\d{1,3}(?:,\d{3})*) per grant', re.IGNORECASE),
+    re.compile(r'up to \$(\d{1,3}(?:,\d{3})*) per grant', re.IGNORECASE),
+    re.compile(r'grant of \$(\d{1,3}(?:,\d{3})*)', re.IGNORECASE),
+    re.compile(r'grants of \$(\d{1,3}(?:,\d{3})*)', re.IGNORECASE)
+]
+
 class KindredGrantScraper:
-    def __init__(self, url=None):
+    # bump when extraction logic changes so stored fingerprints are invalidated
+    parser_version = 4
+    # label for this source in the run metrics
+    metrics_source = 'kc'
+    # source_id stored on this source's grants
+    source_id = 2
+    
+    def __init__(self, url=None, id_registry=None, fingerprints=None, transport=None, parse_pool=None):
         self.url = url or "https://www.kindredfoundation.ca/community-support/kindred-cares-grant"
+        self.transport = transport or get_transport()  # live, record or replay (see scrapers/transport.py)
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         }
         self.grant_data = None
-        self.next_grant_id = 1001  # Start at 1001 to avoid overlap with other scrapers
+        self.id_registry = id_registry or grant_id_registry  # stable grant IDs keyed by source and url
+        self.fingerprints = fingerprints or fingerprint_index  # page fingerprints from previous runs
+        self.parse_pool = parse_pool or inline_parser  # where pages are parsed (see scrapers/pipeline.py)
     
     def fetch_page(self):
         # fetch html content with error handling and retries
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"Fetching {self.url}")
-                response = requests.get(self.url, headers=self.headers, timeout=30)
-                response.raise_for_status()
-                return response.text
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching {self.url} (attempt {attempt+1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                else:
-                    return None
+        return fetch_url(self.transport, self.url, headers=self.headers, source=self.metrics_source)
     
-    def extract_description(self, soup):
+    @timed('extract.description')
+    def extract_description(self, doc):
         # extract description 
         description = ""
         
-        intro_text = soup.find(string=re.compile(r'In 2021, Kindred Foundation established the Kindred Cares Grant to:'))
+        intro_text = doc.find_string(re.compile(r'In 2021, Kindred Foundation established the Kindred Cares Grant to:'))
         if intro_text:
             # find the parent element containing the intro text
             parent = None
-            for p in soup.find_all('p'):
+            for p in doc.find_all('p'):
                 if intro_text in p.text:
                     parent = p.parent
                     break
@@ -62,7 +88,8 @@ class KindredGrantScraper:
                         description += f"• {point}\n"
         
         if not description:
-            content = soup.get_text()
+            metrics.count(self.metrics_source, 'fallback.description_full_text')
+            content = doc.text
             intro_match = re.search(r'In 2021, Kindred Foundation established the Kindred Cares Grant to:', content)
             if intro_match:
                 # try to extract the bullet points after this text
@@ -75,191 +102,141 @@ class KindredGrantScraper:
         
         return description.strip()
     
-    def extract_dates(self, soup):
-        # extract application dates from the important dates section
-        dates = {}
+    def extract_dates(self, doc):
+        # extract application dates from the important dates section, once per page
+        return doc.memo('dates', lambda: self._extract_dates(doc))
+    
+    def _next_occurrence(self, month_day):
+        # dates given without a year refer to the next time that day comes around
         current_year = datetime.now().year
+        parsed = parse_date(f"{month_day}, {current_year}", '%B %d, %Y')
+        if parsed and datetime.strptime(parsed, '%Y-%m-%d') < datetime.now():
+            parsed = parse_date(f"{month_day}, {current_year+1}", '%B %d, %Y')
+        return parsed
+    
+    @timed('extract.dates')
+    def _extract_dates(self, doc):
+        dates = {}
         
-        important_dates = soup.find(string=re.compile(r'Important Dates'))
-        if important_dates:
-            section = None
-            for elem in soup.find_all(['h1', 'h2', 'h3', 'h4']):
-                if 'Important Dates' in elem.text:
-                    section = elem
-                    break
+        section = doc.find_heading('Important Dates')
+        if section:
+            date_text = ""
+            for sibling in doc.section(section):
+                date_text += sibling.text + "\n"
             
-            if section:
-                date_text = ""
-                for sibling in section.find_next_siblings():
-                    if sibling.name in ['h1', 'h2', 'h3', 'h4']:
-                        break
-                    date_text += sibling.text + "\n"
-                
-                open_match = re.search(r'([A-Za-z]+ \d{1,2}, \d{4}):\s*Application window opens', date_text)
-                if open_match:
-                    try:
-                        open_date = datetime.strptime(open_match.group(1), '%B %d, %Y')
-                        dates['application_open'] = open_date.strftime('%Y-%m-%d')
-                    except ValueError:
-                        pass
-                
-                close_match = re.search(r'([A-Za-z]+ \d{1,2}, \d{4})(?:.*?):\s*Application window closes', date_text)
-                if close_match:
-                    try:
-                        close_date = datetime.strptime(close_match.group(1), '%B %d, %Y')
-                        dates['application_close'] = close_date.strftime('%Y-%m-%d')
-                    except ValueError:
-                        pass
+            open_match = OPEN_DATE_RE.search(date_text)
+            open_date = parse_date(open_match.group(1), '%B %d, %Y') if open_match else None
+            if open_date:
+                dates['application_open'] = open_date
+            
+            close_match = CLOSE_DATE_RE.search(date_text)
+            close_date = parse_date(close_match.group(1), '%B %d, %Y') if close_match else None
+            if close_date:
+                dates['application_close'] = close_date
+            
+            if not dates:
+                # try pattern without year
+                open_match = OPEN_NO_YEAR_RE.search(date_text)
+                close_match = CLOSE_NO_YEAR_RE.search(date_text)
                 
-                if not dates:
-                    # try pattern without year
-                    open_match = re.search(r'([A-Za-z]+ \d{1,2})(?:\s+at\s+.*?)?:\s*Application window opens', date_text)
-                    close_match = re.search(r'([A-Za-z]+ \d{1,2})(?:\s+at\s+.*?)?:\s*Application window closes', date_text)
-                    
-                    if open_match:
-                        try:
-                            open_date_str = f"{open_match.group(1)}, {current_year}"
-                            open_date = datetime.strptime(open_date_str, '%B %d, %Y')
-                            if open_date < datetime.now():
-                                open_date = datetime.strptime(f"{open_match.group(1)}, {current_year+1}", '%B %d, %Y')
-                            dates['application_open'] = open_date.strftime('%Y-%m-%d')
-                        except ValueError:
-                            pass
-                    
-                    if close_match:
-                        try:
-                            close_date_str = f"{close_match.group(1)}, {current_year}"
-                            close_date = datetime.strptime(close_date_str, '%B %d, %Y')
-                            if close_date < datetime.now():
-                                close_date = datetime.strptime(f"{close_match.group(1)}, {current_year+1}", '%B %d, %Y')
-                            dates['application_close'] = close_date.strftime('%Y-%m-%d')
-                        except ValueError:
-                            pass
+                open_date = self._next_occurrence(open_match.group(1)) if open_match else None
+                if open_date:
+                    dates['application_open'] = open_date
                 
-                if not dates.get('application_close'):
-                    alt_close = re.search(r'([A-Za-z]+ \d{1,2}, \d{4})\s*at\s*\d+(?:am|pm|AM|PM)\s*[A-Z]+\s*:\s*Application window closes', date_text)
-                    if alt_close:
-                        try:
-                            close_date = datetime.strptime(alt_close.group(1), '%B %d, %Y')
-                            dates['application_close'] = close_date.strftime('%Y-%m-%d')
-                        except ValueError:
-                            pass
+                close_date = self._next_occurrence(close_match.group(1)) if close_match else None
+                if close_date:
+                    dates['application_close'] = close_date
+            
+            if not dates.get('application_close'):
+                alt_close = ALT_CLOSE_RE.search(date_text)
+                close_date = parse_date(alt_close.group(1), '%B %d, %Y') if alt_close else None
+                if close_date:
+                    dates['application_close'] = close_date
         
         if not dates:
-            full_text = soup.get_text()
+            metrics.count(self.metrics_source, 'fallback.dates_full_text')
+            full_text = doc.text
             
-            application_open = re.search(r'[Aa]pplication\s+window\s+opens[:\s]*([A-Za-z]+ \d{1,2},? \d{4})', full_text)
-            if application_open:
-                try:
-                    date_str = application_open.group(1).replace(',', '')
-                    open_date = datetime.strptime(date_str, '%B %d %Y')
-                    dates['application_open'] = open_date.strftime('%Y-%m-%d')
-                except ValueError:
-                    pass
+            application_open = WINDOW_OPENS_RE.search(full_text)
+            open_date = parse_date(application_open.group(1).replace(',', ''), '%B %d %Y') if application_open else None
+            if open_date:
+                dates['application_open'] = open_date
             
-            application_close = re.search(r'[Aa]pplication\s+window\s+closes[:\s]*([A-Za-z]+ \d{1,2},? \d{4})', full_text)
-            if application_close:
-                try:
-                    date_str = application_close.group(1).replace(',', '')
-                    close_date = datetime.strptime(date_str, '%B %d %Y')
-                    dates['application_close'] = close_date.strftime('%Y-%m-%d')
-                except ValueError:
-                    pass
+            application_close = WINDOW_CLOSES_RE.search(full_text)
+            close_date = parse_date(application_close.group(1).replace(',', ''), '%B %d %Y') if application_close else None
+            if close_date:
+                dates['application_close'] = close_date
         
         return dates
     
-    def extract_amount(self, soup):
+    @timed('extract.amount')
+    def extract_amount(self, doc):
         # extract the per-grant amount ($10,000) 
         amounts = {}
         
-        overall_info = soup.find(string=re.compile(r'Overall Information'))
-        if overall_info:
-            section = None
-            for elem in soup.find_all(['h1', 'h2', 'h3', 'h4']):
-                if 'Overall Information' in elem.text:
-                    section = elem
-                    break
+        section = doc.find_heading('Overall Information')
+        if section:
+            info_text = ""
+            for sibling in doc.section(section):
+                info_text += sibling.text + "\n"
             
-            if section:
-                info_text = ""
-                for sibling in section.find_next_siblings():
-                    if sibling.name in ['h1', 'h2', 'h3', 'h4']:
-                        break
-                    info_text += sibling.text + "\n"
-                
-                # look for the pattern that mentions per grant amount
-                per_grant_match = re.search(r'maximum of \$(\d{1,3}(?:,\d{3})*) per grant', info_text)
-                if per_grant_match:
-                    try:
-                        amount_str = per_grant_match.group(1).replace(',', '')
-                        amounts['per_grant'] = float(amount_str)
-                    except ValueError:
-                        pass
-                
-                # look for total funding amount
-                total_match = re.search(r'\$(\d{1,3}(?:,\d{3})*) in total funding', info_text)
-                if total_match:
-                    try:
-                        amount_str = total_match.group(1).replace(',', '')
-                        amounts['total_funding'] = float(amount_str)
-                    except ValueError:
-                        pass
+            # look for the pattern that mentions per grant amount
+            per_grant = find_amount(info_text, [SECTION_PER_GRANT_RE])
+            if per_grant is not None:
+                amounts['per_grant'] = per_grant
+            
+            # look for total funding amount
+            total_funding = find_amount(info_text, [TOTAL_FUNDING_RE])
+            if total_funding is not None:
+                amounts['total_funding'] = total_funding
         
         if 'per_grant' not in amounts:
-            full_text = soup.get_text()
-            
-            per_grant_patterns = [
-                r'maximum of \$(\d{1,3}(?:,\d{3})*) per grant',
-                r'up to \$(\d{1,3}(?:,\d{3})*) per grant',
-                r'grant of \$(\d{1,3}(?:,\d{3})*)',
-                r'grants of \$(\d{1,3}(?:,\d{3})*)'
-            ]
-            
-            for pattern in per_grant_patterns:
-                match = re.search(pattern, full_text, re.IGNORECASE)
-                if match:
-                    try:
-                        amount_str = match.group(1).replace(',', '')
-                        amounts['per_grant'] = float(amount_str)
-                        break
-                    except ValueError:
-                        pass
+            metrics.count(self.metrics_source, 'fallback.amount_full_text')
+            per_grant = find_amount(doc.text, PER_GRANT_PATTERNS)
+            if per_grant is not None:
+                amounts['per_grant'] = per_grant
         
         return amounts
     
-    def extract_eligibility(self, soup):
+    @timed('extract.eligibility')
+    def extract_eligibility(self, doc):
         # extract eligibility criteria from the Eligibility section
         eligibility_text = ""
         
-        eligibility_heading = soup.find(string=re.compile(r'Eligibility'))
-        if eligibility_heading:
-            section = None
-            for elem in soup.find_all(['h1', 'h2', 'h3', 'h4']):
-                if 'Eligibility' in elem.text:
-                    section = elem
-                    break
-            
-            if section:
-                for sibling in section.find_next_siblings():
-                    if sibling.name in ['h1', 'h2', 'h3', 'h4']:
-                        break
-                    if sibling.name in ['p', 'ul', 'ol', 'li']:
-                        eligibility_text += sibling.get_text() + "\n"
+        section = doc.find_heading('Eligibility')
+        if section:
+            for sibling in doc.section(section):
+                if sibling.name in ['p', 'ul', 'ol', 'li']:
+                    eligibility_text += sibling.get_text() + "\n"
         
         if not eligibility_text:
-            full_text = soup.get_text()
+            metrics.count(self.metrics_source, 'fallback.eligibility_full_text')
+            full_text = doc.text
             match = re.search(r'(?:Eligibility|Who can apply)([\s\S]+?)(?=\n\s*\n\s*\w+:|$)', full_text)
             if match:
                 eligibility_text = match.group(1).strip()
         
         return eligibility_text
     
-    def determine_status(self, soup):
+    @timed('extract.status')
+    def status_inputs(self, doc):
+        # collect the page facts that decide whether the grant is active
+        title_elem = doc.find('h1')
+        return {
+            'title': title_elem.text.strip() if title_elem else "",
+            'banner_closed': doc.find_string(re.compile(r'\bCLOSED\b')) is not None,
+            'dates': self.extract_dates(doc)
+        }
+    
+    def determine_status(self, doc):
         # determine if the grant is active based on multiple indicators
-        title_text = ""
-        title_elem = soup.find('h1')
-        if title_elem:
-            title_text = title_elem.text.strip()
+        return self.status_from_inputs(self.status_inputs(doc))
+    
+    def status_from_inputs(self, inputs, today=None):
+        # decide the status from facts gathered by status_inputs, relative to the current date (or to `today`)
+        now = datetime.combine(today, datetime.now().time()) if today else datetime.now()
+        title_text = inputs['title']
+        if title_text:
             if re.search(r'closed', title_text, re.IGNORECASE):
                 logger.info("Grant marked as inactive: 'CLOSED' found in title")
                 return False
@@ -268,18 +245,16 @@ class KindredGrantScraper:
         year_match = re.search(r'\b(20\d{2})\b', title_text)
         if year_match:
             year = int(year_match.group(1))
-            current_year = datetime.now().year
+            current_year = now.year
             if year < current_year:
                 logger.info(f"Grant marked as inactive: title references past year {year}")
                 return False
         
-        banner_closed = soup.find(string=re.compile(r'\bCLOSED\b'))
-        if banner_closed:
+        if inputs['banner_closed']:
             logger.info("Grant marked as inactive: 'CLOSED' found on page")
             return False
         
-        dates = self.extract_dates(soup)
-        now = datetime.now()
+        dates = inputs['dates']
         
         if 'application_open' in dates and 'application_close' in dates:
             open_date = datetime.strptime(dates['application_open'], '%Y-%m-%d')
@@ -302,6 +277,7 @@ class KindredGrantScraper:
         
         # default behavior - if we can't determine status reliably, assume inactive
         logger.info("Grant status undetermined, marking as inactive by default")
+        metrics.count(self.metrics_source, 'fallback.status_undetermined')
         return False
     
     def scrape_grant(self):
@@ -311,36 +287,73 @@ class KindredGrantScraper:
             logger.error("Failed to fetch page")
             return None
         
-        soup = BeautifulSoup(html, 'html.parser')
+        # look up the stable grant ID for this page
+        grant_id = self.id_registry.get_id(self.source_id, self.url)
         
-        # create a unique sequential grant ID
-        grant_id = self.next_grant_id
-        self.next_grant_id += 1
+        # reuse the previous record if the page is unchanged since the last run
+        page_key = f"kc:{self.url}"
+        page_fingerprint = fingerprint(html, self.parser_version)
+        cached = self.fingerprints.lookup(page_key, page_fingerprint)
+        if cached:
+            metrics.count(self.metrics_source, 'pages.unchanged')
+            self.grant_data = cached['record']
+            self.grant_data['grant_id'] = grant_id
+            self.grant_data['crawled_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.grant_data['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.grant_data['is_active'] = self.status_from_inputs(cached['status'])
+            self.id_registry.save()
+            logger.info(f"Page unchanged, reused grant: {self.grant_data['title']} (ID: {grant_id}) - Status: {'Active' if self.grant_data['is_active'] else 'Inactive'}")
+            return self.grant_data
         
-        title_elem = soup.find('h1')
-        title = title_elem.text.strip() if title_elem else "Kindred Cares Grant"
+        parsed = self.parse_pool.submit(self, 'extract_grant', html, self.url).result()
+        self.grant_data = parsed['record']
+        self.grant_data['grant_id'] = grant_id
         
-        description = self.extract_description(soup)
+        self.fingerprints.store(page_key, page_fingerprint, self.grant_data, parsed['status'])
+        self.fingerprints.save()
+        self.id_registry.save()
+        
+        logger.info(f"Scraped grant: {self.grant_data['title']} (ID: {grant_id}) - Status: {'Active' if self.grant_data['is_active'] else 'Inactive'}")
+        return self.grant_data
+    
+    def extract_grant(self, html, url):
+        """
+        Build the grant record from the page, along with the status inputs stored with its fingerprint.
+        Runs in a parse pool worker when one is configured.
+        """
+        with metrics.timer(self.metrics_source, 'parse'):
+            doc = ParsedDocument.from_html(html)
+        
+        title_elem = doc.find('h1')
+        if title_elem:
+            title = title_elem.text.strip()
+        else:
+            metrics.count(self.metrics_source, 'fallback.default_title')
+            title = "Kindred Cares Grant"
+        
+        description = self.extract_description(doc)
         if not description:
+            metrics.count(self.metrics_source, 'fallback.default_description')
             description = "The Kindred Cares Grant provides funding for programs, projects, operations and research in the area of hospice, palliative, and end-of-life care for children and adults with life-limiting conditions and their families."
         
-        dates = self.extract_dates(soup)
+        dates = self.extract_dates(doc)
         deadline = dates.get('application_close', None)
         
         # extract funding amounts - we want the per_grant amount, not total_funding
-        amounts = self.extract_amount(soup)
+        amounts = self.extract_amount(doc)
         amount = amounts.get('per_grant', None)
         
         # extract eligibility criteria
-        eligibility = self.extract_eligibility(soup)
+        eligibility = self.extract_eligibility(doc)
         
         # determine if the grant is currently active
-        is_active = self.determine_status(soup)
+        status = self.status_inputs(doc)
+        is_active = self.status_from_inputs(status)
         
         # compile the grant data
-        self.grant_data = {
-            'grant_id': grant_id,
-            'source_id': 2,  # Simple integer 2 for Kindred Cares
+        grant_data = {
+            'grant_id': None,  # assigned by scrape_grant in the main process
+            'source_id': self.source_id,  # Simple integer 2 for Kindred Cares
             'crawled_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'title': title,
             'description': description,
@@ -348,15 +361,15 @@ class KindredGrantScraper:
             'amount': amount,
             'deadline': deadline,
             'eligibility_criteria': eligibility,
-            'application_url': self.url,
+            'application_url': url,
             'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'is_active': is_active,
             'assignee': ''
         }
         
-        logger.info(f"Scraped grant: {title} (ID: {grant_id}) - Status: {'Active' if is_active else 'Inactive'}")
-        return self.grant_data
+        return {'record': grant_data, 'status': status}
     
+    @timed('save.local')
     def save_data(self):
         # save the scraped grant data using the utility function
         if not self.grant_data:
@@ -364,12 +377,16 @@ class KindredGrantScraper:
             return
         
         try:
-            from scrapers.utils import save_grant_data
-            save_grant_data(self.grant_data, "Kindred_Cares_Grant")
+            from scrapers.utils import save_grants
+            save_grants([self.grant_data])
             logger.info(f"Successfully saved Kindred Cares Grant data")
         except Exception as e:
             logger.error(f"Error saving grant data: {e}")
 
+    def listed_grant_ids(self):
+        # the grant page is configured rather than listed, so it stays listed even when a fetch fails
+        return {self.id_registry.get_id(self.source_id, self.url)}
+
     def run(self):
         """Main method to run the scraper and return the grants"""
         self.scrape_grant()
@@ -0,0 +1,202 @@
+import os
+import copy
+import json
+import math
+import time
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+LOGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
+DEFAULT_REPORT_PATH = os.path.join(LOGS_DIR, "run_report.json")
+DEFAULT_PROMETHEUS_PATH = os.path.join(LOGS_DIR, "scraper_metrics.prom")
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def _new_source():
+    return {
+        'stages': {},    # stage -> list of durations in seconds
+        'fetch': {'requests': 0, 'errors': 0, 'retries': 0, 'bytes': 0, 'from_cache': 0, 'status': {}},
+        'counters': {}   # event name -> count, e.g. fallback.hardcoded_amount
+    }
+
+class RunMetrics:
+    """
+    Timings and counters for one scraper run, aggregated per source (hc, kc, otf, or 'all' for run-wide stages).
+    Safe to update from the runner's worker threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.sources = {}
+
+    def _source(self, source):
+        return self.sources.setdefault(source or 'unknown', _new_source())
+
+    @contextmanager
+    def timer(self, source, stage):
+        # time the enclosed block as one call of `stage`
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(source, stage, time.perf_counter() - start)
+
+    def observe(self, source, stage, seconds):
+        with self.lock:
+            self._source(source)['stages'].setdefault(stage, []).append(seconds)
+
+    def count(self, source, event, value=1):
+        # count how often something happens, such as a fallback path firing
+        with self.lock:
+            counters = self._source(source)['counters']
+            counters[event] = counters.get(event, 0) + value
+
+    def record_fetch(self, source, status, size, seconds, retries=0, from_cache=False):
+        """
+        Record one fetch_url call: final status (or 'error'), body size, latency across attempts and retries used
+        """
+        self.observe(source, 'fetch', seconds)
+        with self.lock:
+            fetch = self._source(source)['fetch']
+            fetch['requests'] += 1
+            fetch['retries'] += retries
+            fetch['bytes'] += size
+            if from_cache:
+                fetch['from_cache'] += 1
+            if status == 'error' or (isinstance(status, int) and status >= 400):
+                fetch['errors'] += 1
+            fetch['status'][str(status)] = fetch['status'].get(str(status), 0) + 1
+
+    def snapshot(self):
+        # raw timings and counters, for sending back from a parse pool worker
+        with self.lock:
+            return copy.deepcopy(self.sources)
+
+    def merge(self, snapshot):
+        """
+        Add timings and counters recorded in another process (see snapshot)
+        """
+        with self.lock:
+            for name, other in snapshot.items():
+                source = self._source(name)
+                for stage, durations in other['stages'].items():
+                    source['stages'].setdefault(stage, []).extend(durations)
+                for key in ('requests', 'errors', 'retries', 'bytes', 'from_cache'):
+                    source['fetch'][key] += other['fetch'][key]
+                for status, value in other['fetch']['status'].items():
+                    source['fetch']['status'][status] = source['fetch']['status'].get(status, 0) + value
+                for event, value in other['counters'].items():
+                    source['counters'][event] = source['counters'].get(event, 0) + value
+
+    def report(self):
+        """
+        Summarize the run: per source, each stage's call count and latency, fetch totals and counters
+        """
+        with self.lock:
+            sources = {}
+            for name, source in sorted(self.sources.items()):
+                stages = {}
+                for stage, durations in sorted(source['stages'].items()):
+                    stages[stage] = {
+                        'calls': len(durations),
+                        'total_s': round(sum(durations), 6),
+                        'p50_ms': round(_percentile(durations, 50) * 1000, 3),
+                        'p95_ms': round(_percentile(durations, 95) * 1000, 3),
+                        'max_ms': round(max(durations) * 1000, 3)
+                    }
+                sources[name] = {
+                    'stages': stages,
+                    'fetch': copy.deepcopy(source['fetch']),
+                    'counters': dict(sorted(source['counters'].items()))
+                }
+            finished_at = time.time()
+            return {
+                'started_at': datetime.fromtimestamp(self.started_at).strftime('%Y-%m-%d %H:%M:%S'),
+                'finished_at': datetime.fromtimestamp(finished_at).strftime('%Y-%m-%d %H:%M:%S'),
+                'duration_s': round(finished_at - self.started_at, 3),
+                'sources': sources
+            }
+
+    def prometheus_lines(self, report=None):
+        # render the report in the Prometheus text exposition format
+        report = report or self.report()
+        lines = [
+            '# HELP scraper_run_duration_seconds Wall time of the last scraper run',
+            '# TYPE scraper_run_duration_seconds gauge',
+            f"scraper_run_duration_seconds {report['duration_s']}",
+            '# HELP scraper_stage_seconds_total Time spent in each stage',
+            '# TYPE scraper_stage_seconds_total counter',
+        ]
+        for name, source in report['sources'].items():
+            for stage, stats in source['stages'].items():
+                lines.append(f'scraper_stage_seconds_total{{source="{name}",stage="{stage}"}} {stats["total_s"]}')
+        lines += ['# HELP scraper_stage_calls_total Calls of each stage', '# TYPE scraper_stage_calls_total counter']
+        for name, source in report['sources'].items():
+            for stage, stats in source['stages'].items():
+                lines.append(f'scraper_stage_calls_total{{source="{name}",stage="{stage}"}} {stats["calls"]}')
+        lines += ['# HELP scraper_fetch_requests_total Pages fetched by final status', '# TYPE scraper_fetch_requests_total counter']
+        for name, source in report['sources'].items():
+            for status, value in source['fetch']['status'].items():
+                lines.append(f'scraper_fetch_requests_total{{source="{name}",status="{status}"}} {value}')
+        for metric, key, help_text in (
+            ('scraper_fetch_bytes_total', 'bytes', 'Bytes of page bodies fetched'),
+            ('scraper_fetch_retries_total', 'retries', 'Fetch retries after a failed attempt'),
+            ('scraper_fetch_cached_total', 'from_cache', 'Fetches served from the HTTP cache or cassettes'),
+        ):
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+            for name, source in report['sources'].items():
+                if source['fetch']['requests']:
+                    lines.append(f'{metric}{{source="{name}"}} {source["fetch"][key]}')
+        lines += ['# HELP scraper_events_total Events such as fallback paths firing', '# TYPE scraper_events_total counter']
+        for name, source in report['sources'].items():
+            for event, value in source['counters'].items():
+                lines.append(f'scraper_events_total{{source="{name}",event="{event}"}} {value}')
+        return lines
+
+    def write(self, report_path=None, prometheus_path=None):
+        """
+        Write the JSON run report and the Prometheus textfile; returns the report
+        """
+        report = self.report()
+        for path, content in (
+            (report_path or DEFAULT_REPORT_PATH, json.dumps(report, indent=4)),
+            (prometheus_path or DEFAULT_PROMETHEUS_PATH, '\n'.join(self.prometheus_lines(report)) + '\n'),
+        ):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # textfile collectors may read at any time, so never expose a partial file
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+                logger.info(f"Wrote run metrics to {path}")
+            except OSError as e:
+                logger.error(f"Error writing run metrics to {path}: {e}")
+        return report
+
+# shared by every scraper and the runner
+metrics = RunMetrics()
+
+def timed(stage):
+    """
+    Decorator timing a scraper method as `stage`, under the scraper's metrics_source
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with metrics.timer(self.metrics_source, stage):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
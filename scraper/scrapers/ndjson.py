@@ -0,0 +1,147 @@
+import os
+import csv
+import gzip
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# orjson is several times faster than the json module when installed; override with SCRAPER_JSON_SERIALIZER
+DEFAULT_SERIALIZER = os.getenv('SCRAPER_JSON_SERIALIZER', 'orjson')
+
+def _json_dumps(record):
+    return json.dumps(record, ensure_ascii=False).encode('utf-8')
+
+def _orjson_serializer():
+    import orjson
+    return orjson.dumps, orjson.loads
+
+# name -> factory returning (dumps to bytes, loads from bytes or str)
+SERIALIZERS = {
+    'json': lambda: (_json_dumps, json.loads),
+    'orjson': _orjson_serializer,
+}
+
+def get_serializer(name=None):
+    """
+    Return (dumps, loads) for the named serializer, falling back to the json module if it is not installed
+    """
+    name = name or DEFAULT_SERIALIZER
+    try:
+        return SERIALIZERS[name]()
+    except (KeyError, ImportError) as e:
+        if name != DEFAULT_SERIALIZER:
+            logger.warning(f"JSON serializer '{name}' is not available, falling back to json: {e}")
+        return SERIALIZERS['json']()
+
+def _open(path, mode, name=None):
+    # gzip is picked from the final file name, so readers and writers agree on the format
+    if (name or path).endswith('.gz'):
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+class NdjsonWriter:
+    """
+    Writes records to a newline-delimited JSON file as they are produced, one line per record.
+    Paths ending in .gz are gzip-compressed. The file is written under a temporary name
+    and only replaces `path` once closed, so readers never see a partial run.
+    Safe to write to from several threads.
+    """
+
+    def __init__(self, path, serializer=None):
+        self.path = path
+        self.dumps = get_serializer(serializer)[0]
+        self.lock = threading.Lock()
+        self.count = 0
+        self.tmp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = _open(self.tmp_path, 'wb', name=path)
+
+    def write(self, record):
+        line = self.dumps(record) + b'\n'
+        with self.lock:
+            self.file.write(line)
+            self.count += 1
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.close()
+            self.file = None
+            os.replace(self.tmp_path, self.path)
+        logger.info(f"Wrote {self.count} records to {self.path}")
+
+    def abort(self):
+        # drop everything written so far and leave any previous file in place
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.close()
+            self.file = None
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+def read_ndjson(path, serializer=None):
+    """
+    Yield the records of an NDJSON file (gzip-compressed if it ends in .gz) one at a time
+    """
+    loads = get_serializer(serializer)[1]
+    with _open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield loads(line)
+
+def ndjson_to_json(ndjson_path, json_path):
+    """
+    Write the records of an NDJSON file as a pretty JSON array, one record at a time.
+    The output is identical to json.dump(records, f, ensure_ascii=False, indent=4).
+    """
+    from scrapers.utils import atomic_write
+
+    def write(tmp_path):
+        count = 0
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('[')
+            for record in read_ndjson(ndjson_path):
+                text = json.dumps(record, ensure_ascii=False, indent=4).replace('\n', '\n    ')
+                f.write((',\n    ' if count else '\n    ') + text)
+                count += 1
+            f.write('\n]' if count else ']')
+
+    atomic_write(json_path, write)
+    logger.info(f"Derived {json_path} from {ndjson_path}")
+
+def ndjson_to_csv(ndjson_path, csv_path):
+    """
+    Write the records of an NDJSON file as CSV, one record at a time.
+    Columns are every key seen in the file, in first-seen order, so the file is read twice.
+    """
+    from scrapers.utils import atomic_write
+
+    columns = {}
+    for record in read_ndjson(ndjson_path):
+        columns.update(dict.fromkeys(record))
+
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(columns))
+            writer.writeheader()
+            for record in read_ndjson(ndjson_path):
+                writer.writerow(record)
+
+    atomic_write(csv_path, write)
+    logger.info(f"Derived {csv_path} from {ndjson_path}")
@@ -1,19 +1,14 @@
-import requests
-from bs4 import BeautifulSoup
 import re
-import json
 from datetime import datetime
-import os
 import logging
-import sys
-import time
-from scrapers.utils import save_grant_data
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from scrapers.fetcher import fetch_url
+from scrapers.transport import get_transport
+from scrapers.metrics import metrics, timed
+from scrapers.document import ParsedDocument
+from scrapers.extraction import parse_date, find_amount
+from scrapers.fingerprints import fingerprint, fingerprint_index
+from scrapers.grant_ids import grant_id_registry
+from scrapers.pipeline import inline_parser
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,35 +17,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# "Minimum $10,000" in the Amount Awarded section
+MINIMUM_AMOUNT_PATTERNS = [re.compile(r'Minimum\s+\$?([\d,]+)', re.IGNORECASE)]
+LONG_DATE_RE = re.compile(r'([A-Za-z]+ \d{1,2}, \d{4})')
+PERIOD_START_RE = re.compile(r'from\s+([A-Za-z]+ \d{1,2}, \d{4})')
+
 class OTFGrantScraper:
-    def __init__(self):
-        self.next_grant_id = 2001  # start at 2001
+    # bump when extraction logic changes so stored fingerprints are invalidated
+    parser_version = 4
+    # label for this source in the run metrics
+    metrics_source = 'otf'
+    # source_id stored on this source's grants
+    source_id = 3
+    
+    def __init__(self, id_registry=None, fingerprints=None, transport=None, parse_pool=None):
+        self.id_registry = id_registry or grant_id_registry  # stable grant IDs keyed by source and url
+        self.fingerprints = fingerprints or fingerprint_index  # page fingerprints from previous runs
         self.grants = []
         self.grant_urls = {
             "Seed Grant": "https://otf.ca/our-grants/community-investments-grants/seed-grant",
             "Grow Grant": "https://otf.ca/our-grants/community-investments-grants/grow-grant"
         }
+        self.transport = transport or get_transport()  # live, record or replay (see scrapers/transport.py)
+        self.parse_pool = parse_pool or inline_parser  # where pages are parsed (see scrapers/pipeline.py)
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         }
         
     def fetch_page(self, url):
         # fetch html content with error handling and retries
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"Fetching {url}")
-                response = requests.get(url, headers=self.headers, timeout=30)
-                response.raise_for_status()
-                return response.content
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching {url} (attempt {attempt+1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2)  
-                else:
-                    return None
+        return fetch_url(self.transport, url, headers=self.headers, binary=True, source=self.metrics_source)
     
-    def extract_description(self, soup, grant_type):
+    @timed('extract.description')
+    def extract_description(self, doc, grant_type):
         # extract grant description based on the grant type
         description = ""
         
@@ -61,13 +60,14 @@ class OTFGrantScraper:
         }
         
         # find the heading with the specified text
-        heading = soup.find(string=re.compile(re.escape(heading_texts.get(grant_type, "")), re.IGNORECASE))
+        heading_pattern = re.compile(re.escape(heading_texts.get(grant_type, "")), re.IGNORECASE)
+        heading = doc.find_string(heading_pattern)
         
         if heading:
             # try to find the parent element that contains the heading
             parent_elem = None
             for tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                found = soup.find(tag, string=re.compile(re.escape(heading_texts.get(grant_type, "")), re.IGNORECASE))
+                found = next((elem for elem in doc.find_all(tag) if elem.string and heading_pattern.search(elem.string)), None)
                 if found:
                     parent_elem = found
                     break
@@ -79,8 +79,9 @@ class OTFGrantScraper:
                     description = next_p.text.strip()
 
         if not description:
+            metrics.count(self.metrics_source, 'fallback.description_first_long_paragraph')
             # look for paragraphs directly on the page
-            paragraphs = soup.find_all('p')
+            paragraphs = doc.find_all('p')
             for p in paragraphs:
                 # if the paragraph follows the header section and seems like a description
                 if len(p.text.strip()) > 50:  
@@ -89,12 +90,13 @@ class OTFGrantScraper:
         
         return description
     
-    def extract_amount(self, soup, grant_type):
+    @timed('extract.amount')
+    def extract_amount(self, doc, grant_type):
         # Extract the minimum amount from Amount Awarded section
         amount = None
         
         # Look for the Amount Awarded section
-        amount_section = soup.find(string=re.compile(r'AMOUNT AWARDED', re.IGNORECASE))
+        amount_section = doc.find_string(re.compile(r'AMOUNT AWARDED', re.IGNORECASE))
         
         if amount_section:
             # Find the parent container
@@ -112,22 +114,13 @@ class OTFGrantScraper:
             # Get the entire text of the section
             section_text = parent.get_text()
             
-            # Specific pattern based on grant type
-            if grant_type == "Seed Grant":
-                min_match = re.search(r'Minimum\s+\$?([\d,]+)', section_text, re.IGNORECASE)
-            else:  # Grow Grant
-                min_match = re.search(r'Minimum\s+\$?([\d,]+)', section_text, re.IGNORECASE)
-            
-            if min_match:
-                min_amount = min_match.group(1).replace(',', '')
-                try:
-                    amount = float(min_amount)
-                    logger.info(f"Extracted amount: ${amount} for {grant_type}")
-                except ValueError:
-                    logger.error(f"Failed to convert amount '{min_amount}' to float")
+            amount = find_amount(section_text, MINIMUM_AMOUNT_PATTERNS)
+            if amount is not None:
+                logger.info(f"Extracted amount: ${amount} for {grant_type}")
         
         # Fallback to hardcoded values if extraction fails
         if amount is None:
+            metrics.count(self.metrics_source, 'fallback.hardcoded_amount')
             if grant_type == "Seed Grant":
                 amount = 10000.0
                 logger.info(f"Using fallback amount for Seed Grant: $10,000")
@@ -137,11 +130,12 @@ class OTFGrantScraper:
         
         return amount
     
-    def extract_deadline(self, soup):
+    @timed('extract.deadline')
+    def extract_deadline(self, doc):
         # extract the deadline date (month day, year)
         deadline = None
         
-        deadline_heading = soup.find(string=re.compile(r'NEXT DEADLINE', re.IGNORECASE))
+        deadline_heading = doc.find_string(re.compile(r'NEXT DEADLINE', re.IGNORECASE))
         
         if deadline_heading:
             parent = None
@@ -164,33 +158,20 @@ class OTFGrantScraper:
                             break
                 
                 if date_text:
-                    date_match = re.search(r'([A-Za-z]+ \d{1,2}, \d{4})', date_text)
+                    date_match = LONG_DATE_RE.search(date_text)
                     if date_match:
-                        date_str = date_match.group(1)
-                        try:
-                            deadline_date = datetime.strptime(date_str, '%B %d, %Y')
-                            deadline = deadline_date.strftime('%Y-%m-%d')
-                        except ValueError:
-                            try:
-                                deadline_date = datetime.strptime(date_str.replace(',', ''), '%B %d %Y')
-                                deadline = deadline_date.strftime('%Y-%m-%d')
-                            except ValueError:
-                                pass
+                        deadline = parse_date(date_match.group(1), '%B %d, %Y')
         
         if not deadline:
-            text = soup.get_text()
-            date_match = re.search(r'([A-Za-z]+ \d{1,2}, \d{4})', text)
+            metrics.count(self.metrics_source, 'fallback.deadline_full_text')
+            date_match = LONG_DATE_RE.search(doc.text)
             if date_match:
-                date_str = date_match.group(1)
-                try:
-                    deadline_date = datetime.strptime(date_str, '%B %d, %Y')
-                    deadline = deadline_date.strftime('%Y-%m-%d')
-                except ValueError:
-                    pass
+                deadline = parse_date(date_match.group(1), '%B %d, %Y')
         
         return deadline
     
-    def extract_eligibility(self, soup):
+    @timed('extract.eligibility')
+    def extract_eligibility(self, doc):
         # extract eligibility criteria dynamically
         eligibility_text = ""
         
@@ -204,7 +185,7 @@ class OTFGrantScraper:
             "demonstrate that it is the appropriate organization or community to carry out the proposed project"
         ]
         
-        bullet_items = soup.find_all('li')
+        bullet_items = doc.find_all('li')
         matching_bullets = []
         
         for bullet in bullet_items:
@@ -216,6 +197,7 @@ class OTFGrantScraper:
         
         # if we couldn't find any matching bullets, use the known values
         if not matching_bullets:
+            metrics.count(self.metrics_source, 'fallback.hardcoded_eligibility')
             matching_bullets = [
                 "deliver programs and services in one of four sectors: sports and recreation, arts and culture, environment, and human and social services.",
                 "have a primary purpose, presence, and reputation for delivering community-based programs and services with direct community benefit in one of OTF's 16 geographic catchment areas in Ontario.",
@@ -238,8 +220,11 @@ class OTFGrantScraper:
             "Religious entities"
         ]
         
-        for heading_type in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'b']:
-            headings = soup.find_all(heading_type)
+        # collect candidate headings in one traversal, then check them tag type by tag type
+        heading_types = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'b']
+        candidates = doc.find_all(*heading_types)
+        for heading_type in heading_types:
+            headings = [elem for elem in candidates if elem.name == heading_type]
             for heading in headings:
                 heading_text = heading.text.strip()
                 for expected in expected_types:
@@ -249,6 +234,7 @@ class OTFGrantScraper:
         
         # if we couldn't find the organization types, use our known list
         if not org_types:
+            metrics.count(self.metrics_source, 'fallback.hardcoded_org_types')
             org_types = expected_types
         
         for org_type in org_types:
@@ -256,95 +242,154 @@ class OTFGrantScraper:
         
         return eligibility_text
     
-    def determine_active_status(self, soup):
-        # determine if grant is active based on application period
-        is_active = False
+    @timed('extract.status')
+    def active_status_inputs(self, doc):
+        # collect the page facts that decide whether the grant is active
+        start_date = None
         
         # look for application period text
-        app_period_text = soup.find(string=re.compile(r'grant application period is from', re.IGNORECASE))
+        app_period_text = doc.find_string(re.compile(r'grant application period is from', re.IGNORECASE))
         if app_period_text:
             # extract the start date from the application period
             period_text = app_period_text.strip()
-            start_date_match = re.search(r'from\s+([A-Za-z]+ \d{1,2}, \d{4})', period_text)
+            start_date_match = PERIOD_START_RE.search(period_text)
             
             if start_date_match:
-                start_date_str = start_date_match.group(1)
-                try:
-                    start_date = datetime.strptime(start_date_str, '%B %d, %Y')
-                    if datetime.now() >= start_date:
-                        is_active = True
-                except ValueError:
-                    pass
+                start_date = parse_date(start_date_match.group(1), '%B %d, %Y')
         
         # also check if there's text indicating the grant is closed
+        closed = False
         closed_indicators = ['deadline has passed', 'closed', 'not accepting applications']
         for indicator in closed_indicators:
-            if re.search(indicator, soup.get_text(), re.IGNORECASE):
-                is_active = False
+            if re.search(indicator, doc.text, re.IGNORECASE):
+                closed = True
                 break
         
-        return is_active
+        return {'start_date': start_date, 'closed': closed}
+    
+    def determine_active_status(self, doc):
+        # determine if grant is active based on application period
+        return self.active_status_from_inputs(self.active_status_inputs(doc))
+    
+    def active_status_from_inputs(self, inputs, today=None):
+        # decide the status from facts gathered by active_status_inputs, relative to the current date (or to `today`)
+        if inputs['closed'] or not inputs['start_date']:
+            return False
+        now = datetime.combine(today, datetime.now().time()) if today else datetime.now()
+        return now >= datetime.strptime(inputs['start_date'], '%Y-%m-%d')
+    
+    def status_from_inputs(self, inputs, today=None):
+        # same rule under the name the other scrapers use, for the offline status sweep
+        return self.active_status_from_inputs(inputs, today)
     
     def parse_grant(self, html_content, grant_type, url):
         # extract all required information from the grant page
         if not html_content:
             logger.error(f"Failed to fetch {grant_type} page")
             return None
-        
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # create a unique sequential grant ID
-        grant_id = self.next_grant_id
-        self.next_grant_id += 1
+        return self.finish_grant(self.start_grant(html_content, grant_type, url))
+    
+    def start_grant(self, html_content, grant_type, url):
+        """
+        Look up the grant ID and page fingerprint, then hand the page to the parse pool unless it is
+        unchanged since the last run. Returns a job for finish_grant.
+        """
+        job = {
+            'grant_type': grant_type,
+            # look up the stable grant ID for this page
+            'grant_id': self.id_registry.get_id(self.source_id, url),
+            'page_key': f"otf:{url}",
+            'fingerprint': fingerprint(html_content, self.parser_version, grant_type)
+        }
+        # reuse the previous record if the page is unchanged since the last run
+        job['cached'] = self.fingerprints.lookup(job['page_key'], job['fingerprint'])
+        if not job['cached']:
+            job['future'] = self.parse_pool.submit(self, 'extract_grant', html_content, grant_type, url)
+        return job
+    
+    def finish_grant(self, job):
+        # wait for the parsed record, attach its grant ID and remember the page fingerprint
+        grant_type = job['grant_type']
+        grant_id = job['grant_id']
+        if job['cached']:
+            metrics.count(self.metrics_source, 'pages.unchanged')
+            grant_data = job['cached']['record']
+            grant_data['grant_id'] = grant_id
+            grant_data['crawled_date'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            grant_data['last_updated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            grant_data['is_active'] = self.active_status_from_inputs(job['cached']['status'])
+            logger.info(f"Page unchanged, reused details for: {grant_type} (ID: {grant_id})")
+            return grant_data
+        
+        parsed = job['future'].result()
+        grant_data = parsed['record']
+        grant_data['grant_id'] = grant_id
+        self.fingerprints.store(job['page_key'], job['fingerprint'], grant_data, parsed['status'])
+        logger.info(f"Parsed details for: {grant_type} (ID: {grant_id})")
+        return grant_data
+    
+    def extract_grant(self, html_content, grant_type, url):
+        # build the grant record and its status inputs; runs in a parse pool worker when one is configured
+        with metrics.timer(self.metrics_source, 'parse'):
+            doc = ParsedDocument.from_html(html_content)
         
         # Get eligibility text directly from our hardcoded function
-        eligibility_criteria = self.extract_eligibility(soup)
+        eligibility_criteria = self.extract_eligibility(doc)
+        status = self.active_status_inputs(doc)
         
         # compile the grant data
         grant_data = {
-            'grant_id': grant_id,
-            'source_id': 3,  # Simple integer 3 for OTF grants
+            'grant_id': None,  # assigned by finish_grant in the main process
+            'source_id': self.source_id,  # Simple integer 3 for OTF grants
             'crawled_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'title': grant_type,
-            'description': self.extract_description(soup, grant_type),
+            'description': self.extract_description(doc, grant_type),
             'funding_agency': 'Ontario Trillium Foundation',
-            'amount': self.extract_amount(soup, grant_type),
-            'deadline': self.extract_deadline(soup),
+            'amount': self.extract_amount(doc, grant_type),
+            'deadline': self.extract_deadline(doc),
             'eligibility_criteria': eligibility_criteria,
             'application_url': url,
             'last_updated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'is_active': self.determine_active_status(soup),
+            'is_active': self.active_status_from_inputs(status),
             'assignee': ''
         }
-        
-        logger.info(f"Parsed details for: {grant_type} (ID: {grant_id})")
-        return grant_data
-    
-    def save_data(self, data, grant_type):
-        # save the scraped grant data using the utility function
-        if not data:
-            logger.warning(f"No grant data to save for {grant_type}")
+        return {'record': grant_data, 'status': status}
+
+    @timed('save.local')
+    def save_data(self):
+        # save all scraped grants at once using the utility function
+        if not self.grants:
+            logger.warning("No OTF grant data to save")
             return
-        
+
         try:
-            from scrapers.utils import save_grant_data
-            # Use consistent OTF prefix for both Seed and Grow grants
-            save_grant_data(data, "OTF_Grant")
-            logger.info(f"Successfully saved {grant_type} data")
+            from scrapers.utils import save_grants
+            save_grants(self.grants)
+            logger.info(f"Successfully saved {len(self.grants)} OTF grants")
         except Exception as e:
-            logger.error(f"Error saving grant data for {grant_type}: {e}")
-    
+            logger.error(f"Error saving OTF grant data: {e}")
+
+    def listed_grant_ids(self):
+        # the grant pages are configured rather than listed, so they stay listed even when a fetch fails
+        return {self.id_registry.get_id(self.source_id, url) for url in self.grant_urls.values()}
+
     def run(self):
-        # scrape all grant types
+        # scrape all grant types, fetching every page first so parsing in the pool overlaps the remaining fetches
+        jobs = []
         for grant_type, url in self.grant_urls.items():
             logger.info(f"Processing {grant_type} from {url}")
             html_content = self.fetch_page(url)
             if html_content:
-                grant_data = self.parse_grant(html_content, grant_type, url)
-                if grant_data:
-                    self.grants.append(grant_data)
-                    self.save_data(grant_data, grant_type)
+                jobs.append(self.start_grant(html_content, grant_type, url))
+        
+        for job in jobs:
+            try:
+                self.grants.append(self.finish_grant(job))
+            except Exception as e:
+                logger.error(f"Error parsing {job['grant_type']} page: {e}")
             
+        self.fingerprints.save()
+        self.id_registry.save()
         logger.info(f"Completed scraping {len(self.grants)} OTF grants")
         return self.grants
 
@@ -353,6 +398,7 @@ def main():
         logger.info("Starting OTF grant scraper")
         scraper = OTFGrantScraper()
         grants = scraper.run()
+        scraper.save_data()
         if grants:
             logger.info(f"Successfully completed OTF grant scraping. Found {len(grants)} grants.")
         else:
@@ -0,0 +1,51 @@
+import os
+import re
+import logging
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# lxml is much faster than the pure-python html.parser; override with SCRAPER_HTML_PARSER to compare backends
+DEFAULT_PARSER = os.getenv('SCRAPER_HTML_PARSER', 'lxml')
+
+# elements that never hold grant content, removed before the tree is built
+PRUNED_TAGS = ('script', 'style', 'noscript', 'nav', 'footer')
+PRUNE_RE = re.compile(r'<(%s)\b[^>]*>.*?</\1\s*>|<!--.*?-->' % '|'.join(PRUNED_TAGS), re.IGNORECASE | re.DOTALL)
+PRUNE_BYTES_RE = re.compile(PRUNE_RE.pattern.encode('ascii'), re.IGNORECASE | re.DOTALL)
+
+_parser = None
+
+def get_parser():
+    # resolve the configured backend once, falling back to html.parser if lxml is not installed
+    global _parser
+    if _parser is None:
+        set_parser(DEFAULT_PARSER)
+    return _parser
+
+def set_parser(name):
+    """
+    Switch the tree builder used by every scraper ('lxml', 'html.parser' or 'html5lib')
+    """
+    global _parser
+    try:
+        BeautifulSoup('', name)
+        _parser = name
+    except Exception as e:
+        logger.warning(f"HTML parser '{name}' is not available, falling back to html.parser: {e}")
+        _parser = 'html.parser'
+    return _parser
+
+def prune_html(html):
+    # strip script, style, nav, footer and comment blocks from raw html (str or bytes)
+    if isinstance(html, bytes):
+        return PRUNE_BYTES_RE.sub(b'', html)
+    return PRUNE_RE.sub('', html)
+
+def make_soup(html, parse_only=None, prune=True, parser=None):
+    """
+    Build a BeautifulSoup tree with the configured backend.
+    Pass a SoupStrainer as parse_only to build only the elements an extractor needs.
+    """
+    if prune:
+        html = prune_html(html)
+    return BeautifulSoup(html, parser or get_parser(), parse_only=parse_only)
@@ -0,0 +1,83 @@
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from scrapers.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# scrapers created inside each pool process, one per source
+_worker_scrapers = {}
+
+def _init_worker(log_level):
+    # spawned workers start with unconfigured logging; keep extraction logs at the runner's level
+    logging.basicConfig(level=log_level, format='%(asctime)s — %(levelname)s — %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+def _run_in_worker(source_key, method, args):
+    # runs in a pool process: call a scraper's extraction method and send back its result and metrics
+    from scrapers.sources import create_scraper
+    scraper = _worker_scrapers.get(source_key)
+    if scraper is None:
+        scraper = _worker_scrapers[source_key] = create_scraper(source_key)
+    metrics.reset()
+    result = getattr(scraper, method)(*args)
+    return result, metrics.snapshot()
+
+class InlineParser:
+    """
+    Runs extraction immediately in the calling thread; used when no parse pool is configured
+    """
+
+    def submit(self, scraper, method, *args):
+        future = Future()
+        try:
+            future.set_result(getattr(scraper, method)(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+class ParsePool:
+    """
+    Process pool for the CPU-bound part of a run: tree building and extraction.
+    Scrapers keep fetching while fetched bodies are parsed here, so a run can use every core.
+    Workers only turn html into plain grant dicts; grant IDs and fingerprints stay in the main process.
+    """
+
+    def __init__(self, max_workers=None):
+        # spawn rather than fork: the runner's fetch threads may hold logging or metrics locks at fork time
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(logging.getLogger().getEffectiveLevel(),)
+        )
+
+    def submit(self, scraper, method, *args):
+        """
+        Run scraper.<method>(*args) in a worker and return a Future for its result.
+        The method must only depend on its arguments, since the worker builds its own scraper for the source.
+        """
+        future = Future()
+
+        def done(worker_future):
+            try:
+                result, snapshot = worker_future.result()
+                metrics.merge(snapshot)
+                future.set_result(result)
+            except Exception as e:
+                logger.error(f"Error parsing {scraper.metrics_source} page in worker: {e}")
+                future.set_exception(e)
+
+        self.executor.submit(_run_in_worker, scraper.metrics_source, method, args).add_done_callback(done)
+        return future
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# shared by scrapers that are not given a pool
+inline_parser = InlineParser()
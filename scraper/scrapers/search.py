@@ -0,0 +1,153 @@
+import os
+import sys
+import sqlite3
+import logging
+import argparse
+import threading
+from scrapers.storage import format_grant
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEARCH_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "search.db")
+
+# indexed text columns and their bm25 weights; a match in the title counts most
+TEXT_COLUMNS = {'title': 10.0, 'funding_agency': 2.0, 'description': 1.0, 'eligibility_criteria': 1.0}
+# stored with each row for filtering and display, not searched
+STORED_COLUMNS = ['grant_id', 'source_id', 'is_active', 'deadline']
+
+def _quote_terms(query):
+    # the query as plain words when it isn't valid FTS5 syntax, keeping a trailing * as a prefix search
+    terms = []
+    for term in query.split():
+        prefix = term.endswith('*')
+        term = term.rstrip('*').replace('"', '')
+        if term:
+            terms.append(f'"{term}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+class SearchIndex:
+    """
+    SQLite FTS5 index over grant titles, agencies, descriptions and eligibility criteria, in data/search.db.
+    Rebuilt over every stored grant after each run and swapped in whole, so the file can also be shipped
+    as a static artifact.
+    Queries use FTS5 syntax: words, "exact phrases", prefix* terms, AND / OR / NOT, ranked by bm25.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_SEARCH_PATH
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def build(self, grants):
+        """
+        Index `grants` into a new file and replace the current index with it; returns the number indexed
+        """
+        columns = STORED_COLUMNS + list(TEXT_COLUMNS)
+        rows = []
+        for grant in grants:
+            formatted_grant = format_grant(grant)
+            rows.append(tuple(formatted_grant.get(column) for column in columns))
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            with conn:
+                unindexed = ', '.join(f"{column} UNINDEXED" for column in STORED_COLUMNS)
+                # no stemming, so prefix* terms match the words as written; "fund*" also finds funding and funders
+                conn.execute(
+                    f"CREATE VIRTUAL TABLE grants_fts USING fts5({unindexed}, {', '.join(TEXT_COLUMNS)}, "
+                    f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+                )
+                conn.executemany(f"INSERT INTO grants_fts ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", rows)
+                # merge the index segments into one for faster queries
+                conn.execute("INSERT INTO grants_fts (grants_fts) VALUES ('optimize')")
+        finally:
+            conn.close()
+
+        with self.lock:
+            self.close()
+            os.replace(tmp_path, self.path)
+        logger.info(f"Indexed {len(rows)} grants for search in {self.path}")
+        return len(rows)
+
+    def _execute(self, query, filters, params, limit):
+        weights = ', '.join(['0'] * len(STORED_COLUMNS) + [str(weight) for weight in TEXT_COLUMNS.values()])
+        description = (STORED_COLUMNS + list(TEXT_COLUMNS)).index('description')
+        sql = (
+            f"SELECT grant_id, source_id, is_active, deadline, title, "
+            f"snippet(grants_fts, {description}, '[', ']', '...', 12) AS snippet, "
+            f"bm25(grants_fts, {weights}) AS score "
+            f"FROM grants_fts WHERE grants_fts MATCH ?{filters} ORDER BY score LIMIT ?"
+        )
+        with self.lock:
+            return self.connect().execute(sql, [query] + params + [limit]).fetchall()
+
+    def search(self, query, limit=20, source_id=None, is_active=None):
+        """
+        Grants matching `query`, best first, as dicts with grant_id, source_id, is_active, deadline, title,
+        a highlighted description snippet and a bm25 score (higher is better).
+        Text that isn't valid FTS5 syntax, like "not-for-profit", is searched as plain words.
+        """
+        if not query or not query.strip():
+            return []
+        if not os.path.exists(self.path):
+            logger.warning(f"No search index at {self.path}; run the scrapers to build it")
+            return []
+
+        filters, params = '', []
+        if source_id is not None:
+            filters += " AND source_id = ?"
+            params.append(int(source_id))
+        if is_active is not None:
+            filters += " AND is_active = ?"
+            params.append(int(bool(is_active)))
+
+        try:
+            rows = self._execute(query, filters, params, limit)
+        except sqlite3.OperationalError as e:
+            logger.debug(f"Searching '{query}' as plain words: {e}")
+            query = _quote_terms(query)
+            if not query:
+                return []
+            rows = self._execute(query, filters, params, limit)
+
+        results = []
+        for row in rows:
+            result = dict(row)
+            result['is_active'] = bool(result['is_active'])
+            result['score'] = -result['score']
+            results.append(result)
+        return results
+
+# shared by the runner
+search_index = SearchIndex()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the grant full-text index")
+    parser.add_argument('query', help='FTS5 query: words, "exact phrases", prefix* terms, AND / OR / NOT')
+    parser.add_argument('--limit', type=int, default=20, help="maximum number of results")
+    parser.add_argument('--source', type=int, help="only grants from this source_id")
+    parser.add_argument('--active', action='store_true', help="only active grants")
+    args = parser.parse_args(argv)
+
+    for result in search_index.search(args.query, limit=args.limit, source_id=args.source, is_active=True if args.active else None):
+        status = 'active' if result['is_active'] else 'inactive'
+        sys.stdout.write(f"{result['score']:>8.3f}  {result['grant_id']}  [{status}, deadline {result['deadline']}]  {result['title']}\n")
+        sys.stdout.write(f"          {' '.join(result['snippet'].split())}\n")
+
+if __name__ == "__main__":
+    main()
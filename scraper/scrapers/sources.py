@@ -0,0 +1,38 @@
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# every grant source: key -> (display name, scraper class as "module:Class", constructor arguments)
+# keys match each scraper's metrics_source; modules are only imported when a run selects the source
+SOURCES = {
+    'hc': ("Health Canada", "scrapers.hcscraper:HealthCanadaGrantScraper", {'fetch_mode': 'async'}),
+    'kc': ("Kindred Cares", "scrapers.kcscraper:KindredGrantScraper", {}),
+    'otf': ("OTF", "scrapers.otfscraper:OTFGrantScraper", {}),
+}
+
+def select_sources(only=None):
+    """
+    Return the source keys to run, in registry order.
+    `only` is a list of keys or a comma-separated string such as "hc,otf"; unknown keys raise ValueError.
+    """
+    if not only:
+        return list(SOURCES)
+    if isinstance(only, str):
+        only = [key.strip() for key in only.split(',') if key.strip()]
+    unknown = [key for key in only if key not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown source(s) {', '.join(unknown)}; expected one of {', '.join(SOURCES)}")
+    return [key for key in SOURCES if key in only]
+
+def load_scraper_class(key):
+    # import the scraper module for this source on first use
+    module_name, class_name = SOURCES[key][1].split(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+def create_scraper(key, **kwargs):
+    """
+    Build the scraper for a source with its registered constructor arguments plus any overrides
+    """
+    scraper_class = load_scraper_class(key)
+    return scraper_class(**{**SOURCES[key][2], **kwargs})
@@ -0,0 +1,63 @@
+import logging
+from datetime import date, datetime
+from scrapers.fingerprints import fingerprint_index
+from scrapers.storage import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+def status_scrapers():
+    # source_id -> that source's scraper, whose status_from_inputs decides is_active during a scrape
+    from scrapers.sources import SOURCES, create_scraper
+    scrapers = {}
+    for key in SOURCES:
+        scraper = create_scraper(key)
+        scrapers[scraper.source_id] = scraper
+    return scrapers
+
+def recompute_status(grants, status_inputs, scrapers, today=None):
+    """
+    Return grant_id -> is_active as of `today` for each of `grants` whose status inputs were stored with its
+    page fingerprint. Each grant goes through its source scraper's status_from_inputs, the same rule used
+    when the page is scraped, so the sweep and the weekly scrape always agree.
+    Grants without stored inputs, or from a source that is no longer registered, are left out. That includes
+    grants that left their listing, whose fingerprints are dropped when they are deactivated.
+    """
+    today = today or date.today()
+    statuses = {}
+    for grant in grants:
+        inputs = status_inputs.get(grant['grant_id'])
+        scraper = scrapers.get(grant['source_id'])
+        if inputs is None or scraper is None:
+            continue
+        try:
+            statuses[grant['grant_id']] = bool(scraper.status_from_inputs(inputs, today=today))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Could not recompute the status of grant {grant['grant_id']}: {e}")
+    return statuses
+
+def sweep_status(sqlite=None, stores=None, fingerprints=None, today=None, dry_run=False, scrapers=None):
+    """
+    Recompute is_active for every grant in the local SQLite store without scraping, and push only the
+    grants whose status flipped to `stores` (the SQLite store by default). Returns the flipped grants.
+    """
+    sqlite = sqlite or SQLiteStore()
+    grants = sqlite.load()
+    statuses = recompute_status(grants, (fingerprints or fingerprint_index).status_inputs(), scrapers or status_scrapers(), today)
+
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    changed = []
+    for grant in grants:
+        is_active = statuses.get(grant['grant_id'])
+        if is_active is None or is_active == bool(grant['is_active']):
+            continue
+        changed.append({**grant, 'is_active': is_active, 'last_updated': timestamp})
+        logger.info(f"Grant {grant['grant_id']} is now {'active' if is_active else 'inactive'}: {grant['title']}")
+    logger.info(f"Status sweep: {len(changed)} of {len(grants)} grants changed status")
+
+    if changed and not dry_run:
+        for store in stores or [sqlite]:
+            try:
+                store.sync(changed)
+            except Exception as e:
+                logger.error(f"Error pushing status changes to {store.name} store: {e}")
+    return changed
@@ -0,0 +1,399 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "grants.db")
+DEFAULT_SYNC_STATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "supabase_sync_state.json")
+
+# columns of the Grant table, in schema order
+GRANT_COLUMNS = [
+    'grant_id', 'source_id', 'crawled_date', 'title', 'description', 'funding_agency', 'amount',
+    'deadline', 'eligibility_criteria', 'application_url', 'last_updated', 'is_active', 'assignee'
+]
+
+def format_grant(grant):
+    """
+    Normalize a grant's field types for storage (ISO timestamps, YYYY-MM-DD deadline, float amount, bool is_active)
+    """
+    formatted_grant = grant.copy()
+
+    # Format dates if needed
+    for key in ['crawled_date', 'last_updated']:
+        if key in formatted_grant and not isinstance(formatted_grant[key], str):
+            formatted_grant[key] = formatted_grant[key].isoformat() if formatted_grant[key] else None
+
+    # Make sure deadline is in proper date format (YYYY-MM-DD)
+    if 'deadline' in formatted_grant and formatted_grant['deadline']:
+        # If it's already a string in the right format, keep it
+        if not isinstance(formatted_grant['deadline'], str):
+            formatted_grant['deadline'] = formatted_grant['deadline'].strftime('%Y-%m-%d')
+        elif len(formatted_grant['deadline']) > 10:
+            # Truncate if it has time component
+            formatted_grant['deadline'] = formatted_grant['deadline'][:10]
+
+    # Make sure numeric fields are properly typed
+    if 'amount' in formatted_grant and formatted_grant['amount'] is not None:
+        try:
+            formatted_grant['amount'] = float(formatted_grant['amount'])
+        except (ValueError, TypeError):
+            formatted_grant['amount'] = None
+
+    # Ensure boolean fields are properly typed
+    if 'is_active' in formatted_grant:
+        formatted_grant['is_active'] = bool(formatted_grant['is_active'])
+
+    return formatted_grant
+
+# fields refreshed on every crawl, ignored when deciding whether a grant changed
+VOLATILE_FIELDS = ('crawled_date', 'last_updated')
+
+def grant_signature(grant):
+    # hash of a grant's stored content, excluding fields that change on every run
+    formatted_grant = format_grant(grant)
+    content = {key: value for key, value in formatted_grant.items() if key not in VOLATILE_FIELDS}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def classify_grants(grants, previous_signatures):
+    """
+    Split grants into (inserted, updated, unchanged) lists by comparing against
+    a mapping of grant_id -> signature from the previous sync
+    """
+    inserted, updated, unchanged = [], [], []
+    for grant in grants:
+        previous = previous_signatures.get(str(grant['grant_id']))
+        if previous is None:
+            inserted.append(grant)
+        elif previous != grant_signature(grant):
+            updated.append(grant)
+        else:
+            unchanged.append(grant)
+    return inserted, updated, unchanged
+
+class GrantStore:
+    """Interface shared by every storage backend"""
+    name = 'base'
+
+    def save(self, grants):
+        # insert or update grants keyed by grant_id
+        raise NotImplementedError
+
+    def load(self):
+        # return every stored grant
+        raise NotImplementedError
+
+    def get(self, grant_id):
+        # return one grant, or None if it is not stored
+        for grant in self.load():
+            if grant.get('grant_id') == grant_id:
+                return grant
+        return None
+
+    def sync(self, grants):
+        """
+        Save only new or changed grants, compared against what the store already holds.
+        Returns counts of inserted, updated and unchanged grants.
+        """
+        previous_signatures = {str(grant['grant_id']): grant_signature(grant) for grant in self.load()}
+        inserted, updated, unchanged = classify_grants(grants, previous_signatures)
+        if inserted or updated:
+            self.save(inserted + updated)
+        counts = {'inserted': len(inserted), 'updated': len(updated), 'unchanged': len(unchanged)}
+        logger.info(f"Synced grants to {self.name} store: {counts}")
+        return counts
+
+class SupabaseStore(GrantStore):
+    """Grant table in Supabase"""
+    name = 'supabase'
+
+    def __init__(self, client, table='Grant', state_path=None, chunk_size=100, max_retries=3):
+        self.client = client
+        self.table = table
+        self.state_path = state_path or DEFAULT_SYNC_STATE_PATH  # grant signatures as of the last successful sync
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+
+    def save(self, grants):
+        if not grants:
+            logger.warning("No grants to save to Supabase")
+            return None
+
+        try:
+            formatted_grants = [format_grant(grant) for grant in grants]
+            logger.info(f"Upserting {len(formatted_grants)} grants to Supabase")
+
+            # This will insert new records and update existing ones based on the grant_id
+            result = self.client.table(self.table).upsert(formatted_grants, on_conflict='grant_id').execute()
+
+            logger.info(f"Successfully saved {len(formatted_grants)} grants to Supabase")
+            return result
+        except Exception as e:
+            logger.error(f"Error saving to Supabase: {e}")
+            return None
+
+    def load(self):
+        return self.client.table(self.table).select('*').execute().data
+
+    def _load_sync_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Error reading sync state {self.state_path}, treating every grant as new: {e}")
+            return {}
+
+    def _save_sync_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _upsert_chunk(self, chunk):
+        # upsert one chunk, retrying with exponential backoff; returns True on success
+        for attempt in range(self.max_retries):
+            try:
+                self.client.table(self.table).upsert(chunk, on_conflict='grant_id').execute()
+                return True
+            except Exception as e:
+                logger.error(f"Error upserting {len(chunk)} grants to Supabase (attempt {attempt+1}/{self.max_retries}): {e}")
+                if attempt < self.max_retries - 1:
+                    time.sleep(2 ** attempt)
+        return False
+
+    def sync(self, grants):
+        """
+        Upsert only grants that are new or changed since the last successful sync, in bounded chunks.
+        Failed chunks are retried with backoff and left out of the sync state so the next run retries them.
+        """
+        state = self._load_sync_state()
+        inserted, updated, unchanged = classify_grants(grants, state)
+        changed = inserted + updated
+        failed = 0
+
+        for start in range(0, len(changed), self.chunk_size):
+            chunk = changed[start:start + self.chunk_size]
+            if self._upsert_chunk([format_grant(grant) for grant in chunk]):
+                for grant in chunk:
+                    state[str(grant['grant_id'])] = grant_signature(grant)
+            else:
+                failed += len(chunk)
+
+        if changed:
+            self._save_sync_state(state)
+
+        counts = {
+            'inserted': len(inserted),
+            'updated': len(updated),
+            'unchanged': len(unchanged),
+            'failed': failed
+        }
+        logger.info(f"Synced grants to Supabase: {counts}")
+        return counts
+
+    def get(self, grant_id):
+        rows = self.client.table(self.table).select('*').eq('grant_id', grant_id).execute().data
+        return rows[0] if rows else None
+
+    def save_summary(self, rows, as_of, table='GrantSummary'):
+        """
+        Upsert the dashboard aggregates, (dimension, bucket, grants, amount) rows, into the GrantSummary table
+        and drop buckets left over from earlier summaries, such as a source that no longer has grants
+        """
+        records = [{'dimension': dimension, 'bucket': bucket, 'grants': grants, 'amount': amount, 'as_of': as_of}
+                   for dimension, bucket, grants, amount in rows]
+        try:
+            self.client.table(table).upsert(records, on_conflict='dimension,bucket').execute()
+            self.client.table(table).delete().neq('as_of', as_of).execute()
+            logger.info(f"Saved {len(records)} summary rows to Supabase")
+        except Exception as e:
+            logger.error(f"Error saving the grant summary to Supabase: {e}")
+
+class FlatFileStore(GrantStore):
+    """CSV and JSON files under data/, written by utils.save_grants"""
+    name = 'flatfile'
+
+    def __init__(self, data_dir=None):
+        from scrapers.utils import get_data_dir
+        self.data_dir = data_dir or get_data_dir()
+
+    def save(self, grants):
+        from scrapers.utils import save_grants
+        save_grants(grants, data_dir=self.data_dir)
+
+    def load(self):
+        from scrapers.utils import load_combined_grants
+        return load_combined_grants(os.path.join(self.data_dir, "all_grants.json"))
+
+class SQLiteStore(GrantStore):
+    """
+    Local SQLite copy of the Grant table, indexed for fast queries.
+    Also works as an offline stand-in for Supabase.
+    """
+    name = 'sqlite'
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_SQLITE_PATH
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def connect(self):
+        if self.conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            self._create_schema()
+        return self.conn
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS grants (
+                    grant_id INTEGER PRIMARY KEY,
+                    source_id INTEGER,
+                    crawled_date TEXT,
+                    title TEXT,
+                    description TEXT,
+                    funding_agency TEXT,
+                    amount REAL,
+                    deadline TEXT,
+                    eligibility_criteria TEXT,
+                    application_url TEXT,
+                    last_updated TEXT,
+                    is_active INTEGER,
+                    assignee TEXT
+                )
+            """)
+            # grant_id is covered by the primary key index
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_grants_source_id ON grants (source_id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_grants_deadline ON grants (deadline)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_grants_is_active ON grants (is_active)")
+            # near-duplicate grants linked to their canonical grant, replaced on every run
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS grant_duplicates (
+                    grant_id INTEGER PRIMARY KEY,
+                    canonical_grant_id INTEGER,
+                    similarity REAL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_grant_duplicates_canonical ON grant_duplicates (canonical_grant_id)")
+            # dashboard aggregates from scrapers/summary.py, replaced on every run
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS grant_summary (
+                    dimension TEXT,
+                    bucket TEXT,
+                    grants INTEGER,
+                    amount REAL,
+                    as_of TEXT,
+                    PRIMARY KEY (dimension, bucket)
+                )
+            """)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def _row_to_grant(self, row):
+        grant = dict(row)
+        if grant.get('is_active') is not None:
+            grant['is_active'] = bool(grant['is_active'])
+        return grant
+
+    def save(self, grants):
+        # bulk upsert in a single transaction
+        if not grants:
+            logger.warning("No grants to save to SQLite")
+            return
+
+        rows = []
+        for grant in grants:
+            formatted_grant = format_grant(grant)
+            rows.append(tuple(formatted_grant.get(column) for column in GRANT_COLUMNS))
+
+        placeholders = ', '.join('?' for _ in GRANT_COLUMNS)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in GRANT_COLUMNS[1:])
+        sql = (
+            f"INSERT INTO grants ({', '.join(GRANT_COLUMNS)}) VALUES ({placeholders}) "
+            f"ON CONFLICT(grant_id) DO UPDATE SET {updates}"
+        )
+
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.executemany(sql, rows)
+        logger.info(f"Upserted {len(rows)} grants to SQLite at {self.path}")
+
+    def load(self):
+        return self.query()
+
+    def get(self, grant_id):
+        with self.lock:
+            row = self.connect().execute("SELECT * FROM grants WHERE grant_id = ?", (grant_id,)).fetchone()
+        return self._row_to_grant(row) if row else None
+
+    def save_duplicates(self, links):
+        """
+        Replace the stored duplicate links with grant_id -> {'canonical_grant_id', 'similarity'}
+        """
+        rows = [(int(grant_id), int(link['canonical_grant_id']), link['similarity']) for grant_id, link in links.items()]
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.execute("DELETE FROM grant_duplicates")
+                conn.executemany("INSERT INTO grant_duplicates (grant_id, canonical_grant_id, similarity) VALUES (?, ?, ?)", rows)
+        logger.info(f"Saved {len(rows)} duplicate links to SQLite at {self.path}")
+
+    def duplicates(self):
+        # stored duplicate links as grant_id -> {'canonical_grant_id', 'similarity'}
+        with self.lock:
+            rows = self.connect().execute("SELECT * FROM grant_duplicates ORDER BY grant_id").fetchall()
+        return {row['grant_id']: {'canonical_grant_id': row['canonical_grant_id'], 'similarity': row['similarity']} for row in rows}
+
+    def save_summary(self, rows, as_of):
+        """
+        Replace the stored dashboard aggregates with (dimension, bucket, grants, amount) rows
+        """
+        with self.lock:
+            conn = self.connect()
+            with conn:
+                conn.execute("DELETE FROM grant_summary")
+                conn.executemany("INSERT INTO grant_summary (dimension, bucket, grants, amount, as_of) VALUES (?, ?, ?, ?, ?)",
+                                 [tuple(row) + (as_of,) for row in rows])
+        logger.info(f"Saved {len(rows)} summary rows to SQLite at {self.path}")
+
+    def query(self, source_id=None, is_active=None, deadline_before=None, deadline_after=None):
+        """
+        Return grants matching every given filter. Deadlines are compared as YYYY-MM-DD strings.
+        """
+        clauses = []
+        params = []
+        if source_id is not None:
+            clauses.append("source_id = ?")
+            params.append(source_id)
+        if is_active is not None:
+            clauses.append("is_active = ?")
+            params.append(int(bool(is_active)))
+        if deadline_before is not None:
+            clauses.append("deadline < ?")
+            params.append(deadline_before)
+        if deadline_after is not None:
+            clauses.append("deadline > ?")
+            params.append(deadline_after)
+
+        sql = "SELECT * FROM grants"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY grant_id"
+
+        with self.lock:
+            rows = self.connect().execute(sql, params).fetchall()
+        return [self._row_to_grant(row) for row in rows]
@@ -0,0 +1,89 @@
+import os
+import json
+import logging
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUMMARY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "grant_summary.json")
+
+# deadline buckets by days left on the summary date: (label, first day, last day)
+DEADLINE_BUCKETS = [
+    ('passed', -np.inf, -1),
+    ('within 30 days', 0, 30),
+    ('31-90 days', 31, 90),
+    ('91-365 days', 91, 365),
+    ('over a year', 366, np.inf),
+]
+NO_DEADLINE = 'no deadline'
+
+# amount bands in dollars: (label, lower bound included, upper bound excluded)
+AMOUNT_BANDS = [
+    ('under 10k', 0, 10_000),
+    ('10k-50k', 10_000, 50_000),
+    ('50k-250k', 50_000, 250_000),
+    ('250k-1M', 250_000, 1_000_000),
+    ('1M and over', 1_000_000, np.inf),
+]
+NO_AMOUNT = 'no amount'
+
+# dimension -> buckets, in the order dashboards show them
+DIMENSIONS = ('by_source', 'by_is_active', 'by_deadline', 'by_amount_band')
+
+def _buckets(frame, column, labels):
+    # grant count and total amount for every label, including empty ones, in label order
+    grouped = frame.groupby(column, observed=False)['amount'].agg(['size', 'sum'])
+    return {str(label): {'grants': int(grouped['size'].get(label, 0)), 'amount': float(grouped['sum'].get(label, 0.0))}
+            for label in labels}
+
+def summarize(grants, today=None):
+    """
+    Dashboard aggregates over `grants`: totals, and grant counts and summed amounts by source, by is_active,
+    by deadline bucket (days left as of `today`) and by amount band. Returns a JSON-ready dict.
+    """
+    today = pd.Timestamp(today or date.today())
+    frame = pd.DataFrame(grants, columns=['source_id', 'is_active', 'deadline', 'amount'])
+    frame['source_id'] = pd.to_numeric(frame['source_id'], errors='coerce').astype('Int64').astype('string')
+    frame['is_active'] = frame['is_active'].map(lambda value: str(value).lower() in ('true', '1')).map({True: 'true', False: 'false'})
+    frame['amount'] = pd.to_numeric(frame['amount'], errors='coerce')
+
+    deadline = pd.to_datetime(frame['deadline'].astype('string').str[:10], format='%Y-%m-%d', errors='coerce')
+    days_left = (deadline - today).dt.days
+    frame['deadline'] = pd.cut(days_left, [DEADLINE_BUCKETS[0][1]] + [last + 0.5 for _, _, last in DEADLINE_BUCKETS],
+                               labels=[label for label, _, _ in DEADLINE_BUCKETS])
+    frame['deadline'] = frame['deadline'].cat.add_categories(NO_DEADLINE).fillna(NO_DEADLINE)
+    frame['amount_band'] = pd.cut(frame['amount'], [AMOUNT_BANDS[0][1]] + [upper for _, _, upper in AMOUNT_BANDS],
+                                  labels=[label for label, _, _ in AMOUNT_BANDS], right=False)
+    frame['amount_band'] = frame['amount_band'].cat.add_categories(NO_AMOUNT).fillna(NO_AMOUNT)
+    frame['amount'] = frame['amount'].fillna(0.0)
+
+    return {
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'as_of': today.strftime('%Y-%m-%d'),
+        'total': {'grants': len(frame), 'amount': float(frame['amount'].sum())},
+        'by_source': _buckets(frame, 'source_id', sorted(frame['source_id'].dropna().unique(), key=int)),
+        'by_is_active': _buckets(frame, 'is_active', ['true', 'false']),
+        'by_deadline': _buckets(frame, 'deadline', frame['deadline'].cat.categories),
+        'by_amount_band': _buckets(frame, 'amount_band', frame['amount_band'].cat.categories),
+    }
+
+def summary_rows(summary):
+    # the summary as (dimension, bucket, grants, amount) rows, with the totals under dimension 'total'
+    rows = [('total', 'all', summary['total']['grants'], summary['total']['amount'])]
+    for dimension in DIMENSIONS:
+        rows.extend((dimension, bucket, values['grants'], values['amount']) for bucket, values in summary[dimension].items())
+    return rows
+
+def write_summary(summary, path=None):
+    """
+    Write the aggregates to data/grant_summary.json for dashboards to fetch instead of every grant
+    """
+    path = path or DEFAULT_SUMMARY_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote grant summary for {summary['total']['grants']} grants to {path}")
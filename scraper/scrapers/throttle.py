@@ -0,0 +1,115 @@
+import random
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# statuses that mean the host wants us to slow down
+THROTTLE_STATUSES = (429, 503)
+
+def parse_retry_after(value):
+    """
+    Seconds to wait from a Retry-After header, given as delta-seconds or an HTTP date; None if missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+class HostRateLimiter:
+    """
+    Per-host token bucket whose rate adapts to how the host responds.
+    Fast responses raise the rate a step at a time up to max_rate; slow responses, errors and
+    429/503 cut it down to min_rate. A Retry-After header pauses every request to that host.
+    Other hosts are unaffected.
+    """
+
+    def __init__(self, initial_rate=2.0, min_rate=0.2, max_rate=10.0, burst=2,
+                 fast_response=1.0, slow_response=5.0, backoff_base=1.0, backoff_cap=60.0):
+        self.initial_rate = initial_rate  # requests per second for a host we have not talked to yet
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst  # requests that may go out back to back after an idle spell
+        self.fast_response = fast_response  # seconds; quicker responses raise the rate
+        self.slow_response = slow_response  # seconds; slower responses lower it
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def _host(self, url):
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = {'rate': self.initial_rate, 'tokens': 1.0, 'updated': time.monotonic(), 'blocked_until': 0.0}
+        return host, self.hosts[host]
+
+    def wait(self, url):
+        """
+        Block until a request to this url's host is allowed; returns the seconds waited
+        """
+        with self.lock:
+            host, state = self._host(url)
+            now = time.monotonic()
+            state['tokens'] = min(self.burst, state['tokens'] + (now - state['updated']) * state['rate'])
+            state['updated'] = now
+            # take the token before sleeping so concurrent callers queue up behind it
+            state['tokens'] -= 1
+            delay = max(-state['tokens'] / state['rate'], state['blocked_until'] - now, 0.0)
+
+        if delay > 0:
+            logger.debug(f"Waiting {delay:.2f}s before requesting {host}")
+            time.sleep(delay)
+        return delay
+
+    def _set_rate(self, state, rate):
+        # apply a new rate from now on, keeping tokens already earned at the old rate
+        now = time.monotonic()
+        state['tokens'] = min(self.burst, state['tokens'] + (now - state['updated']) * state['rate'])
+        state['updated'] = now
+        state['rate'] = min(self.max_rate, max(self.min_rate, rate))
+
+    def record_response(self, url, seconds):
+        # adapt the host's rate to a successful response that took `seconds`
+        with self.lock:
+            host, state = self._host(url)
+            if seconds <= self.fast_response:
+                self._set_rate(state, state['rate'] + 0.5)
+            elif seconds >= self.slow_response:
+                self._set_rate(state, state['rate'] * 0.75)
+                logger.info(f"{host} is slow ({seconds:.1f}s), lowering rate to {state['rate']:.2f} req/s")
+
+    def record_failure(self, url, attempt, status=None, retry_after=None):
+        """
+        Halve the host's rate after a failed request and return how long to wait before retrying:
+        the Retry-After delay if the host sent one, otherwise exponential backoff with full jitter.
+        A 429 or 503 also pauses all other requests to the host for that long.
+        """
+        delay = retry_after
+        if delay is None:
+            delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        with self.lock:
+            host, state = self._host(url)
+            self._set_rate(state, state['rate'] / 2)
+            if status in THROTTLE_STATUSES or retry_after is not None:
+                state['blocked_until'] = max(state['blocked_until'], time.monotonic() + delay)
+                logger.warning(f"{host} asked us to slow down ({status}); pausing {delay:.1f}s at {state['rate']:.2f} req/s")
+        return delay
+
+    def rate(self, url):
+        with self.lock:
+            return self._host(url)[1]['rate']
+
+# shared by every scraper so rate limits apply per host across threads
+host_rate_limiter = HostRateLimiter()
@@ -0,0 +1,129 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import requests
+from scrapers.http_cache import CachedResponse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CASSETTE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cassettes")
+
+# 'live', 'record' or 'replay'; override with SCRAPER_TRANSPORT to run the whole pipeline offline
+DEFAULT_MODE = os.getenv('SCRAPER_TRANSPORT', 'live')
+
+class LiveTransport:
+    """
+    Fetches pages from the network with a requests session.
+    Every transport exposes the same get(url, headers, timeout) as requests.Session, so scrapers,
+    the fetcher and the HTTP cache can use any of them interchangeably.
+    """
+    mode = 'live'
+    use_cache = True   # revalidate through the shared HTTP cache
+    throttled = True   # apply per-host politeness delays
+
+    def __init__(self, session=None):
+        self.session = session or requests.Session()
+
+    def get(self, url, headers=None, timeout=30):
+        return self.session.get(url, headers=headers, timeout=timeout)
+
+class Cassette:
+    """
+    A directory of recorded responses, one body file and one metadata file per URL
+    """
+
+    def __init__(self, cassette_dir=None):
+        self.cassette_dir = cassette_dir or DEFAULT_CASSETTE_DIR
+
+    def _paths(self, url):
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cassette_dir, f"{name}.json"), os.path.join(self.cassette_dir, f"{name}.body")
+
+    def has(self, url):
+        return os.path.exists(self._paths(url)[0])
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save(self, url, response):
+        meta_path, body_path = self._paths(url)
+        meta = {
+            'url': url,
+            'status_code': response.status_code,
+            'headers': dict(response.headers),
+            'encoding': response.encoding or response.apparent_encoding
+        }
+        os.makedirs(self.cassette_dir, exist_ok=True)
+        # body first, so a cassette entry is only visible once both files exist
+        self._write(body_path, response.content)
+        self._write(meta_path, json.dumps(meta, indent=4).encode('utf-8'))
+
+    def load(self, url):
+        meta_path, body_path = self._paths(url)
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            content = f.read()
+        return CachedResponse(url, meta['status_code'], content, meta.get('headers'), meta.get('encoding'), from_cache=True)
+
+class RecordTransport(LiveTransport):
+    """
+    Fetches pages live and saves every response to a cassette directory for later replay.
+    The HTTP cache is bypassed so cassettes always hold full responses rather than 304s.
+    """
+    mode = 'record'
+    use_cache = False
+    throttled = True
+
+    def __init__(self, cassette_dir=None, session=None):
+        super().__init__(session)
+        self.cassette = Cassette(cassette_dir)
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=30):
+        response = super().get(url, headers=headers, timeout=timeout)
+        with self.lock:
+            self.cassette.save(url, response)
+        logger.info(f"Recorded {url} ({response.status_code}) to {self.cassette.cassette_dir}")
+        return response
+
+class ReplayTransport:
+    """
+    Serves pages from a cassette directory without touching the network.
+    A URL missing from the cassette fails like a connection error, so scrapers handle it as a failed fetch.
+    """
+    mode = 'replay'
+    use_cache = False
+    throttled = False  # no network, so no politeness delays
+
+    def __init__(self, cassette_dir=None):
+        self.cassette = Cassette(cassette_dir)
+
+    def get(self, url, headers=None, timeout=30):
+        if not self.cassette.has(url):
+            raise requests.exceptions.ConnectionError(f"No recorded response for {url} in {self.cassette.cassette_dir}")
+        return self.cassette.load(url)
+
+TRANSPORTS = {
+    'live': LiveTransport,
+    'record': RecordTransport,
+    'replay': ReplayTransport,
+}
+
+def get_transport(mode=None, cassette_dir=None):
+    """
+    Build a transport for the given mode (SCRAPER_TRANSPORT by default) and cassette directory
+    (SCRAPER_CASSETTE_DIR, then data/cassettes)
+    """
+    mode = mode or DEFAULT_MODE
+    if mode not in TRANSPORTS:
+        logger.warning(f"Unknown transport mode '{mode}', expected one of {', '.join(TRANSPORTS)}; using live")
+        mode = 'live'
+    if mode == 'live':
+        return LiveTransport()
+    return TRANSPORTS[mode](cassette_dir or os.getenv('SCRAPER_CASSETTE_DIR'))
@@ -5,111 +5,140 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-def save_grant_data(grant_data, grant_type):
+# grant type prefixes used by the scrapers and the directory each one is saved to
+GRANT_DIRS = {
+    'HC': 'hc_grant',
+    'Kindred': 'kc_grant',
+    'OTF': 'otf_grant'  # Renamed from otf_grants to otf_grant for consistency
+}
+
+# same directories keyed by the source_id stored on each grant
+SOURCE_DIRS = {
+    1: 'hc_grant',
+    2: 'kc_grant',
+    3: 'otf_grant'
+}
+
+def get_data_dir():
     # Get the parent directory (scraper) path
     root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_dir = os.path.join(root_dir, "data")
-    
-    grant_dirs = {
-        'HC': 'hc_grant',
-        'Kindred': 'kc_grant',
-        'OTF': 'otf_grant'  # Renamed from otf_grants to otf_grant for consistency
-    }
-    
-    grant_dir = None
-    for prefix, directory in grant_dirs.items():
-        if grant_type.startswith(prefix):
-            grant_dir = directory
-            break
-    
-    if not grant_dir:
-        logger.error(f"Unknown grant type: {grant_type}")
-        return
+    return os.path.join(root_dir, "data")
 
-    # Ensure directory exists
-    grant_dir_path = os.path.join(data_dir, grant_dir)
-    os.makedirs(grant_dir_path, exist_ok=True)
-    
-    # Define file paths
-    individual_csv = os.path.join(grant_dir_path, "grant.csv")
-    individual_json = os.path.join(grant_dir_path, "grant.json")
-    combined_csv = os.path.join(data_dir, "all_grants.csv")
-    combined_json = os.path.join(data_dir, "all_grants.json")
-    
-    # Save to individual files in the type-specific directory
+def atomic_write(path, write):
+    """
+    Write a file through a temporary file in the same directory so readers never see a partial file.
+    `write` is called with the temporary path.
+    """
+    tmp_path = f"{path}.tmp"
     try:
-        pd.DataFrame([grant_data]).to_csv(individual_csv, index=False)
-        logger.info(f"Saved CSV to {individual_csv}")
-    except Exception as e:
-        logger.error(f"Error saving CSV to {individual_csv}: {e}")
-    
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def write_json(path, data):
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+    atomic_write(path, write)
+
+def write_csv(path, records):
+    atomic_write(path, lambda tmp_path: pd.DataFrame(records).to_csv(tmp_path, index=False))
+
+def load_combined_grants(combined_json):
+    # read the combined JSON file, returning an empty list if it is missing or unreadable
+    if not os.path.exists(combined_json) or os.path.getsize(combined_json) == 0:
+        return []
     try:
-        with open(individual_json, 'w', encoding='utf-8') as f:
-            json.dump(grant_data, f, ensure_ascii=False, indent=4)
-        logger.info(f"Saved JSON to {individual_json}")
+        with open(combined_json, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+        if not content:  # Check if file has content
+            return []
+        existing_data = json.loads(content)
+        if not isinstance(existing_data, list):
+            existing_data = [existing_data]
+        return existing_data
+    except json.JSONDecodeError:
+        logger.warning(f"Error parsing JSON from {combined_json}, creating new file")
     except Exception as e:
-        logger.error(f"Error saving JSON to {individual_json}: {e}")
-    
-    # Update combined CSV file with deduplication
+        logger.warning(f"Error reading {combined_json}, creating new file: {e}")
+    return []
+
+def save_grants(grants, data_dir=None):
+    """
+    Save a whole run's grants in one pass.
+    `grants` can be any iterable, such as read_ndjson() over the run's NDJSON file; it is read once.
+    Per-source files are rewritten with all of that source's grants, and the combined files are merged
+    with existing grants through an index keyed by grant_id. Each file is written once, atomically.
+    """
+    data_dir = data_dir or get_data_dir()
+    combined_csv = os.path.join(data_dir, "all_grants.csv")
+    combined_json = os.path.join(data_dir, "all_grants.json")
+
+    # group grants by their source directory
+    grants_by_dir = {}
+    count = 0
+    for grant in grants:
+        count += 1
+        grant_dir = SOURCE_DIRS.get(grant.get('source_id'))
+        if not grant_dir:
+            logger.error(f"Unknown source_id {grant.get('source_id')} for grant {grant.get('grant_id')}")
+            continue
+        grants_by_dir.setdefault(grant_dir, []).append(grant)
+
+    if not count:
+        logger.warning("No grants to save")
+        return
+
+    # Save to individual files in the type-specific directory
+    for grant_dir, dir_grants in grants_by_dir.items():
+        grant_dir_path = os.path.join(data_dir, grant_dir)
+        os.makedirs(grant_dir_path, exist_ok=True)
+        individual_csv = os.path.join(grant_dir_path, "grant.csv")
+        individual_json = os.path.join(grant_dir_path, "grant.json")
+
+        try:
+            write_csv(individual_csv, dir_grants)
+            logger.info(f"Saved {len(dir_grants)} grants to {individual_csv}")
+        except Exception as e:
+            logger.error(f"Error saving CSV to {individual_csv}: {e}")
+
+        try:
+            write_json(individual_json, dir_grants)
+            logger.info(f"Saved {len(dir_grants)} grants to {individual_json}")
+        except Exception as e:
+            logger.error(f"Error saving JSON to {individual_json}: {e}")
+
+    # merge into the combined files, updating existing grants in place and appending new ones
+    combined = {}
+    for grant in load_combined_grants(combined_json):
+        combined[grant.get('grant_id')] = grant
+    for dir_grants in grants_by_dir.values():
+        for grant in dir_grants:
+            combined[grant['grant_id']] = grant
+    combined_grants = list(combined.values())
+
     try:
-        new_df = pd.DataFrame([grant_data])
-        if os.path.exists(combined_csv) and os.path.getsize(combined_csv) > 0:
-            try:
-                existing_df = pd.read_csv(combined_csv)
-                # Check if grant_id already exists
-                if 'grant_id' in existing_df.columns and grant_data['grant_id'] in existing_df['grant_id'].values:
-                    # Update the existing row
-                    existing_df.loc[existing_df['grant_id'] == grant_data['grant_id']] = new_df.iloc[0]
-                    combined_df = existing_df
-                else:
-                    # Append the new row
-                    combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-            except pd.errors.EmptyDataError:
-                # Handle empty file
-                logger.warning(f"CSV file {combined_csv} is empty, creating new file")
-                combined_df = new_df
-            except Exception as e:
-                logger.warning(f"Error reading {combined_csv}, creating new file: {e}")
-                combined_df = new_df
-        else:
-            combined_df = new_df
-        
-        combined_df.to_csv(combined_csv, index=False)
+        write_csv(combined_csv, combined_grants)
         logger.info(f"Updated combined CSV at {combined_csv}")
     except Exception as e:
         logger.error(f"Error updating combined CSV: {e}")
-    
-    # Update combined JSON file with deduplication
+
     try:
-        existing_data = []
-        if os.path.exists(combined_json) and os.path.getsize(combined_json) > 0:
-            try:
-                with open(combined_json, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if content:  # Check if file has content
-                        existing_data = json.loads(content)
-                        if not isinstance(existing_data, list):
-                            existing_data = [existing_data]
-            except json.JSONDecodeError:
-                logger.warning(f"Error parsing JSON from {combined_json}, creating new file")
-            except Exception as e:
-                logger.warning(f"Error reading {combined_json}, creating new file: {e}")
-        
-        # Check if grant_id already exists and update instead of append
-        grant_updated = False
-        for i, grant in enumerate(existing_data):
-            if grant.get('grant_id') == grant_data['grant_id']:
-                existing_data[i] = grant_data
-                grant_updated = True
-                break
-        
-        if not grant_updated:
-            existing_data.append(grant_data)
-            
-        with open(combined_json, 'w', encoding='utf-8') as f:
-            json.dump(existing_data, f, ensure_ascii=False, indent=4)
+        write_json(combined_json, combined_grants)
         logger.info(f"Updated combined JSON at {combined_json}")
     except Exception as e:
         logger.error(f"Error updating combined JSON: {e}")
-    
-    logger.info(f"Saved grant data to {grant_dir} and updated combined files")
\ No newline at end of file
+
+    logger.info(f"Saved {count} grants and updated combined files")
+
+def save_grant_data(grant_data, grant_type):
+    """
+    Save a single grant. Prefer save_grants for a whole run, which writes each file once.
+    """
+    if not any(grant_type.startswith(prefix) for prefix in GRANT_DIRS):
+        logger.error(f"Unknown grant type: {grant_type}")
+        return
+
+    save_grants([grant_data])